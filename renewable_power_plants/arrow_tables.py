@@ -0,0 +1,29 @@
+"""Conversion of DataFrames to Arrow tables, shared by download_and_process
+and validation_and_output."""
+
+import logging
+
+import pyarrow as pa
+
+logger = logging.getLogger('notebook')
+
+
+def dataframe_to_arrow(df, preserve_index=False):
+    """This function converts a DataFrame to an Arrow table. Columns of
+    mixed types, e.g. numbers and text, can not be stored by Arrow. Their
+    values are converted to strings and the columns are logged."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=preserve_index)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            logger.warning('Column %s has values of mixed types, they are '
+                           'stored as strings', column)
+            df[column] = df[column].where(df[column].isnull(),
+                                          df[column].astype(str))
+    return pa.Table.from_pandas(df, preserve_index=preserve_index)
@@ -15,7 +15,7 @@
 #   </tr>
 # </table>
 
-# This script downlads and extracts the original data of renewable power plant lists from the data sources, processes and merges them. It subsequently adds the geolocation for each power plant. Finally it saves the DataFrames as pickle-files. Make sure you run the download and process Notebook before the validation and output Notebook.
+# This script downlads and extracts the original data of renewable power plant lists from the data sources, processes and merges them. It subsequently adds the geolocation for each power plant. Finally it saves the DataFrames as Parquet dataset partitioned by country and energy source. Make sure you run the download and process Notebook before the validation and output Notebook.
 
 # # Table of contents 
 # 
@@ -23,7 +23,18 @@
 # * [2. Settings](#2.-Settings)
 #     * [2.1 Choose download option](#2.1-Choose-download-option)
 #     * [2.2 Download function](#2.2-Download-function)
-#     * [2.3 Setup translation dictionaries](#2.3-Setup-translation-dictionaries)
+#     * [2.3 Download original data](#2.3-Download-original-data)
+#     * [2.4 Setup translation dictionaries](#2.4-Setup-translation-dictionaries)
+#     * [2.5 Setup data types of the original data](#2.5-Setup-data-types-of-the-original-data)
+#     * [2.6 Columnar cache of Excel files](#2.6-Columnar-cache-of-Excel-files)
+#     * [2.7 Conversion of coordinates](#2.7-Conversion-of-coordinates)
+#     * [2.8 Translation of values](#2.8-Translation-of-values)
+#     * [2.9 Stage cache](#2.9-Stage-cache)
+#     * [2.10 Parallel processing of the countries](#2.10-Parallel-processing-of-the-countries)
+#     * [2.11 Geocoding index](#2.11-Geocoding-index)
+#     * [2.12 Memory budget mode](#2.12-Memory-budget-mode)
+#     * [2.13 Processed data as Parquet dataset](#2.13-Processed-data-as-Parquet-dataset)
+#     * [2.14 BMWi statistics for validation](#2.14-BMWi-statistics-for-validation)
 # * [3. Download and process per country](#3.-Download-and-process-per-country)
 #     * [3.1 Germany DE](#3.1-Germany-DE)
 #         * [3.1.1 Download and read](#3.1.1-Download-and-read)
@@ -57,6 +68,7 @@
 #         * [3.4.4 Translate values and harmonize energy source](#3.4.4-Translate-values-and-harmonize-energy-source)
 #         * [3.4.5 Georeferencing -_work in progress_](#3.4.6-Georeferencing---work-in-progress)
 #         * [3.4.6 Save](#3.4.7-Save)
+#     * [3.5 Process all countries](#3.5-Process-all-countries)
 # * [Part 2: Validation and output](validation_and_output.ipynb)
 # 
 
@@ -68,21 +80,32 @@
 
 from collections import OrderedDict
 import io
+import concurrent.futures
+import hashlib
+import inspect
 import json
+import multiprocessing
 import os
 import subprocess
+import tempfile
+import time
 import zipfile
 import posixpath
+import shutil
 import urllib.parse
 import urllib.request
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import requests 
+import requests.adapters
 import sqlite3 
 import logging
 import getpass
 import utm # for transforming geoinformation in the utm-format
 import re # provides regular expression matching operations
+from arrow_tables import dataframe_to_arrow # shared with validation_and_output
 
 # Starting from ipython 4.3.0 logging is not directing its ouput to the out cell. It might be operating system related but 
 # until the issue is fixed, we are going to use print(). 
@@ -101,6 +124,21 @@ os.makedirs('output', exist_ok=True)
 os.makedirs('output/renewable_power_plants', exist_ok=True)
 
 
+# In[ ]:
+
+# Number of worker processes for parallel parsing and processing
+processing_workers = os.cpu_count()
+
+def process_pool(max_workers=processing_workers):
+    """This function returns an executor for parallel processing. Functions
+    defined in a notebook can only be sent to forked processes, thus threads
+    are used on platforms without fork."""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers, mp_context=multiprocessing.get_context('fork'))
+    return concurrent.futures.ThreadPoolExecutor(max_workers)
+
+
 # # 2. Settings
 
 # ## 2.1 Choose download option
@@ -111,87 +149,196 @@ os.makedirs('output/renewable_power_plants', exist_ok=True)
 download_from = 'original_sources'
 # download_from = 'opsd_server' 
 
+# Only process German entries which are new or changed since the last run
+# (see 3.1.4), all other entries are taken from the last run
+incremental = False
 
-# In[44]:
-
-if download_from == 'opsd_server':
+# Store the German data compactly to reduce the memory needed (see 2.12)
+memory_budget = False
 
-# While OPSD is in beta, we need to supply authentication
-    password = getpass.getpass('Please enter the beta user password:')
-    session = requests.session()
-    session.auth = ('beta', password) 
-
-# Specify direction to original_data folder on the opsd data server
-    url_opsd = 'http://data.open-power-system-data.org/renewables_power_plants/'
-    version = '2016-08-25'
-    folder = '/original_data'
+# Process the registers of the TSOs at once or in chunks of csv_chunksize 
+# rows, which bounds the memory needed for them (see 3.1.7)
+processing_mode = 'batch'
+# processing_mode = 'stream'
+csv_chunksize = 100000
 
 
 # ## 2.2 Download function
+# All original data is downloaded into the folder input/original_data. Files are fetched in large chunks over one pooled session and written to a temporary `.part` file, which is only renamed to its final name once it is complete. An interrupted download is resumed from the `.part` file via HTTP Range requests. For each finished download a small `.download.json` record with size and checksum is stored next to the file; a local file is only used as cache if it still matches this record (and the expected size or checksum, if given).
 
 # In[45]:
 
-def download_and_cache(url, session=None):
+# Size of the chunks in which files are streamed to disk (1 MB)
+download_chunksize = 1024 * 1024
+
+# Number of files downloaded in parallel
+download_workers = 4
+
+
+def download_session(pool_size=download_workers):
+    """This function returns a requests session whose connection pool
+    is large enough to be shared by all parallel downloads."""
+    session = requests.session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                            pool_maxsize=pool_size,
+                                            max_retries=3)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def file_checksum(filepath):
+    """This function returns the sha256 hex digest of a local file."""
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for chunk in iter(lambda: file.read(download_chunksize), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def is_cached(filepath, size=None, sha256=None):
+    """This function checks whether filepath is a complete download,
+    i.e. it matches its download record and the expected size/checksum."""
+    recordpath = filepath + '.download.json'
+    if not (os.path.exists(filepath) and os.path.exists(recordpath)):
+        return False
+    with open(recordpath) as file:
+        record = json.load(file)
+    actual_size = os.path.getsize(filepath)
+    if actual_size != record['size']:
+        return False
+    if size is not None and actual_size != size:
+        return False
+    if sha256 is not None and (record['sha256'] != sha256 
+                               or file_checksum(filepath) != sha256):
+        return False
+    return True
+
+
+def fetch(url, partpath, session):
+    """This function downloads url into partpath. If partpath already
+    holds the beginning of the file, only the remainder is requested."""
+    offset = os.path.getsize(partpath) if os.path.exists(partpath) else 0
+    headers = {'Range': 'bytes={0}-'.format(offset)} if offset else {}
+
+    with session.get(url, headers=headers, stream=True, timeout=60) as r:
+        # The sizes and ranges of an encoded (e.g. gzip) response refer to 
+        # the encoded bytes, whereas the decoded bytes are written
+        encoded = r.headers.get('Content-Encoding', 'identity') != 'identity'
+        if r.status_code == 206 and encoded:
+            # The .part file can not be continued, it is downloaded again
+            os.remove(partpath)
+            return fetch(url, partpath, session)
+        if r.status_code == 416:
+            # Nothing left to request: the .part file is either complete 
+            # or belongs to a different version of the file
+            total = r.headers.get('Content-Range', '').rpartition('/')[2]
+            if total != str(offset):
+                os.remove(partpath)
+                return fetch(url, partpath, session)
+            return
+        r.raise_for_status()
+
+        if r.status_code == 206:
+            mode = 'ab'
+            total = r.headers.get('Content-Range', '').rpartition('/')[2]
+        else:
+            # The server ignored the Range header and sends the whole file
+            mode = 'wb'
+            offset = 0
+            total = None if encoded else r.headers.get('Content-Length')
+
+        with open(partpath, mode) as file:
+            for chunk in r.iter_content(download_chunksize):
+                file.write(chunk)
+
+    # A truncated transfer stays a .part file and is resumed next time
+    if total and total.isdigit() and os.path.getsize(partpath) != int(total):
+        raise IOError('Incomplete download of {0}: {1} of {2} bytes'.format(
+            url, os.path.getsize(partpath), total))
+
+
+def download_and_cache(url, session=None, filename=None, size=None,
+                       sha256=None, directory='input/original_data'):
     """This function downloads a file into a folder called 
     original_data and returns the local filepath."""
-    path = urllib.parse.urlsplit(url).path
-    filename = posixpath.basename(path)
-    filepath = "input/original_data/" + filename
+    if filename is None:
+        path = urllib.parse.urlsplit(url).path
+        filename = posixpath.basename(path)
+    filepath = os.path.join(directory, filename)
     print(url)
-
-    # check if file exists, if not download it
-    filepath = "input/original_data/" + filename
     print(filepath)
-    if not os.path.exists(filepath):
-        if not session:
-            print('No session')
-            session = requests.session()
-        
-        print("Downloading file: ", filename)
-        r = session.get(url, stream=True)
 
-        chuncksize = 1024
-        with open(filepath, 'wb') as file:
-            for chunck in r.iter_content(chuncksize):
-                file.write(chunck)
-    else:
+    # check if a verified copy of the file exists, if not download it
+    if is_cached(filepath, size, sha256):
         print("Using local file from", filepath)
-    filepath = '' + filepath
-    return filepath
+        return filepath
 
+    if not session:
+        print('No session')
+        session = download_session()
 
-# ## 2.3 Setup translation dictionaries
-# 
-# Column and value names of the original data sources will be translated to English and standardized across different sources. Standardized column names, e.g. "electrical_capacity" are required to merge data in one DataFrame.<br>
-# The column and the value translation lists are provided in the input folder of the Data Package.
+    print("Downloading file: ", filename)
+    partpath = filepath + '.part'
+    try:
+        fetch(url, partpath, session)
+    except requests.ConnectionError:
+        # Offline: fall back to an unverified local file if there is one
+        if os.path.exists(filepath):
+            logger.warning('Could not download %s, using unverified local '
+                           'file %s', url, filepath)
+            return filepath
+        raise
+
+    checksum = file_checksum(partpath)
+    actual_size = os.path.getsize(partpath)
+    if ((size is not None and actual_size != size) 
+            or (sha256 is not None and checksum != sha256)):
+        os.remove(partpath)
+        raise IOError('Downloaded file {0} does not match the expected '
+                      'size/checksum'.format(filename))
+
+    os.replace(partpath, filepath)
+    with open(filepath + '.download.json', 'w') as file:
+        json.dump({'url': url, 'size': actual_size, 'sha256': checksum}, file)
+    return filepath
 
-# In[46]:
 
-# Get column translation list
-columnnames = pd.read_csv('input/column_translation_list.csv')
+def download_all(sources, session=None, max_workers=download_workers):
+    """This function downloads all sources in parallel and returns a 
+    dictionary of the local filepaths. sources maps a name to either an
+    url or a dictionary of keyword arguments for download_and_cache. A 
+    source without its own session is downloaded with session."""
+    if not session:
+        session = download_session(max_workers)
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        futures = {}
+        for name, source in sources.items():
+            kwargs = dict(source) if isinstance(source, dict) else {'url': source}
+            kwargs.setdefault('session', session)
+            futures[name] = executor.submit(download_and_cache, **kwargs)
+        return {name: future.result() for name, future in futures.items()}
 
 
-# In[47]:
+# ## 2.3 Download original data
+# The URLs of all original data sources are specified here depending on the chosen download option, so that all files can be downloaded in parallel before processing.
 
-# Get value translation list
-valuenames = pd.read_csv('input/value_translation_list.csv')
+# In[44]:
 
+if download_from == 'opsd_server':
 
-# # 3. Download and process per country
-# 
-# For one country after the other, the original data is downloaded, read, processed, translated, eventually georeferenced and saved. If respective files are already in the local folder, these will be utilized.
-# To process the provided data [pandas DataFrame](http://pandas.pydata.org/pandas-docs/stable/dsintro.html#dataframe) is applied.<br>
+# While OPSD is in beta, we need to supply authentication
+    password = getpass.getpass('Please enter the beta user password:')
+    session = download_session()
+    session.auth = ('beta', password) 
 
-# ## 3.1 Germany DE
+# Specify direction to original_data folder on the opsd data server
+    url_opsd = 'http://data.open-power-system-data.org/renewables_power_plants/'
+    version = '2016-08-25'
+    folder = '/original_data'
 
-# ### 3.1.1 Download and read
-# The data which will be processed below is provided by the following data sources:
-# 
-# **[Netztransparenz.de](https://www.netztransparenz.de/de/Anlagenstammdaten.htm)** - Official grid transparency platform from the German TSOs (50Hertz, Amprion, TenneT and TransnetBW).
-# 
-# **Bundesnetzagentur (BNetzA)** - German Federal Network Agency for Electricity, Gas, Telecommunications, Posts and Railway (Data for [roof-mounted PV power plants](http://www.bundesnetzagentur.de/cln_1422/DE/Sachgebiete/ElektrizitaetundGas/Unternehmen_Institutionen/ErneuerbareEnergien/Photovoltaik/DatenMeldgn_EEG-VergSaetze/DatenMeldgn_EEG-VergSaetze_node.html) and for [all other renewable energy power plants](http://www.bundesnetzagentur.de/cln_1412/DE/Sachgebiete/ElektrizitaetundGas/Unternehmen_Institutionen/ErneuerbareEnergien/Anlagenregister/Anlagenregister_Veroeffentlichung/Anlagenregister_Veroeffentlichungen_node.html))
 
-# In[48]:
+# In[ ]:
 
 # point URLs to original data depending on the chosen download option
 if download_from == 'original_sources':
@@ -199,113 +346,1042 @@ if download_from == 'original_sources':
     url_netztransparenz ='https://www.netztransparenz.de/de/file/Anlagenstammdaten_2015_final.zip'  
     url_bnetza ='http://www.bundesnetzagentur.de/SharedDocs/Downloads/DE/Sachgebiete/Energie/Unternehmen_Institutionen/ErneuerbareEnergien/Anlagenregister/VOeFF_Anlagenregister/2016_06_Veroeff_AnlReg.xls?__blob=publicationFile&v=1'
     url_bnetza_pv = 'https://www.bundesnetzagentur.de/SharedDocs/Downloads/DE/Sachgebiete/Energie/Unternehmen_Institutionen/ErneuerbareEnergien/Photovoltaik/Datenmeldungen/Meldungen_Aug-Mai2016.xls?__blob=publicationFile&v=2'
+    url_DK_ens = 'https://ens.dk/sites/ens.dk/files/Statistik/anlaegprodtilnettet_0.xls'
+    url_DK_energinet = 'http://www.energinet.dk/SiteCollectionDocuments/Danske%20dokumenter/El/SolcelleGraf.xlsx'
+    url_DK_geo = 'http://download.geonames.org/export/zip/DK.zip'
+    url_FR_gouv = "http://www.statistiques.developpement-durable.gouv.fr/fileadmin/documents/Themes/Energies_et_climat/Les_differentes_energies/Energies_renouvelables/donnees_locales/2014/electricite-renouvelable-par-commune-2014.xls"
+    url_FR_geo = 'http://public.opendatasoft.com/explore/dataset/code-postal-code-insee-2015/download/?format=csv&timezone=Europe/Berlin&use_labels_for_header=true'
     
 elif download_from == 'opsd_server':
     
     url_netztransparenz = (url_opsd + version + folder + '/Netztransparenz/' + 'Anlagenstammdaten_2015_final.zip')
     url_bnetza = (url_opsd + version + folder + '/BNetzA/' + '2016_06_Veroeff_AnlReg.xls')
     url_bnetza_pv = (url_opsd + version + folder + '/BNetzA/' + 'Meldungen_Aug-Mai2016.xls')
+    url_DK_ens = (url_opsd + version + folder + '/DK/anlaegprodtilnettet.xls')
+    url_DK_energinet = (url_opsd + version + folder + '/DK/SolcelleGraf.xlsx')
+    url_DK_geo = (url_opsd + version + folder + 'DK/DK.zip')
+    url_FR_gouv = (url_opsd + version + folder + '/FR/electricite-renouvelable-par-commune-2014.xls')
+    url_FR_geo = (url_opsd + version + folder + 'FR/code-postal-code-insee-2015.csv')
+    url_PL_ure = (url_opsd + version + folder + '/PL/simple.rtf')
 
-
-# In[49]:
+# The BMWi statistics used for validation are only available from the BMWi
+url_bmwi_stat = ('http://www.erneuerbare-energien.de/EE/Redaktion/DE/'
+                 'Downloads/zeitreihen-zur-entwicklung-der-erneuerbaren-'
+                 'energien-in-deutschland-1990-2015-excel.xlsx'
+                 '?__blob=publicationFile&v=6')
+
+
+# In[ ]:
+
+sources = {'netztransparenz': url_netztransparenz,
+           'bnetza': url_bnetza,
+           'bnetza_pv': url_bnetza_pv,
+           'DK_ens': url_DK_ens,
+           'DK_energinet': url_DK_energinet,
+           'DK_geo': url_DK_geo,
+           'FR_gouv': url_FR_gouv,
+           # The url of the French geo-information has no file name
+           'FR_geo': {'url': url_FR_geo,
+                      'filename': 'code-postal-insee-2015.csv'},
+           'bmwi_stat': {'url': url_bmwi_stat,
+                         'filename': 'zeitreihen-zur-entwicklung-der-'
+                                     'erneuerbaren-energien-in-deutschland-'
+                                     '1990-2015-excel.xlsx'}}
 
 # Download all data sets before processing.
 if download_from == 'original_sources':
     
-    netztransparenz_zip = get_ipython().magic('time zipfile.ZipFile(download_and_cache(url_netztransparenz))')
-    bnetza_xls = get_ipython().magic('time download_and_cache(url_bnetza)')
-    bnetza_pv_xls = get_ipython().magic('time download_and_cache(url_bnetza_pv)')
+    filepaths = get_ipython().magic('time download_all(sources)')
 
 elif download_from == 'opsd_server':
+    # The Polish data is only available on the opsd server
+    sources['PL_ure'] = url_PL_ure
+
+    # The BMWi statistics are downloaded from the BMWi, the credentials of
+    # the opsd server must not be sent there
+    sources['bmwi_stat']['session'] = download_session()
+    
     # Check if the user is offline
-    # if offline, do not give a session as parameter.
+    # if offline, locally cached files will be used.
     try:
         online = True
         r = session.get('http://data.open-power-system-data.org/renewables_power_plants/')
     except requests.ConnectionError:
         logger.warning('The user is offline. Proceeding with the script!')
         
-        
-    try:     
-        netztransparenz_zip = get_ipython().magic('time zipfile.ZipFile(download_and_cache(url_netztransparenz, session))')
-        bnetza_xls = get_ipython().magic('time download_and_cache(url_bnetza, session)')
-        bnetza_pv_xls = get_ipython().magic('time download_and_cache(url_bnetza_pv, session)')
-    except zipfile.BadZipFile:
-        raise FileNotFoundError('One of the Zip File is corrupted! Delete them                                  Also, check your opsd password!')
+    filepaths = get_ipython().magic('time download_all(sources, session)')
 
 
-# In[50]:
+# ## 2.4 Setup translation dictionaries
+# 
+# Column and value names of the original data sources will be translated to English and standardized across different sources. Standardized column names, e.g. "electrical_capacity" are required to merge data in one DataFrame.<br>
+# The column and the value translation lists are provided in the input folder of the Data Package.
 
-# Read TSO data from zip file
-print('Reading Amprion_Anlagenstammdaten_2015.csv')
-amprion_df = pd.read_csv(netztransparenz_zip.open('Amprion_Anlagenstammdaten_2015.csv'),
-                         sep=';',
-                         thousands='.',
-                         decimal=',',
-                         header=0,
-                         parse_dates=[11, 12, 13, 14],
-                         encoding='cp1252',
-                         dayfirst=True)
-
-print('Reading 50Hertz_Anlagenstammdaten_2015.csv')
-hertz_df = pd.read_csv(netztransparenz_zip.open('50Hertz_Anlagenstammdaten_2015.csv'),
-                       sep=';',
-                       thousands='.',
-                       decimal=',',
-                       header=0,
-                       parse_dates=[11, 12, 13, 14],
-                       encoding='cp1252',
-                       dayfirst=True)
-
-print('Reading TenneT_Anlagenstammdaten_2015.csv')
-tennet_df = pd.read_csv(netztransparenz_zip.open('TenneT_Anlagenstammdaten_2015.csv'),
-                        sep=';',
-                        thousands='.',
-                        decimal=',',
-                        header=0,
-                        parse_dates=[11, 12, 13, 14],
-                        encoding='cp1252',
-                        dayfirst=True)
-
-print('Reading TransnetBW_Anlagenstammdaten_2015.csv')
-transnetbw_df = pd.read_csv(netztransparenz_zip.open('TransnetBW_Anlagenstammdaten_2015.csv'),
-                            sep=';',
-                            thousands='.',
-                            decimal=',',
-                            header=0,
-                            parse_dates=[11, 12, 13, 14],
-                            encoding='cp1252',
-                            dayfirst=True,
-                            low_memory=False)
+# In[46]:
 
+# Get column translation list
+columnnames = pd.read_csv('input/column_translation_list.csv')
 
-# In[51]:
 
-# Read BNetzA register
-print('Reading bnetza - 2016_06_Veroeff_AnlReg.xls')
-bnetza_df = pd.read_excel(bnetza_xls,
-                          sheetname='Gesamtübersicht',
-                          header=0,
-                          converters={'4.9 Postleit-zahl': str,
-                                      'Gemeinde-Schlüssel': str})
+# In[47]:
+
+# Get value translation list
+valuenames = pd.read_csv('input/value_translation_list.csv')
+
 
-# Read BNetzA-PV register
-print('Reading bnetza_pv - Meldungen_Aug-Mai2016.xls')
-bnetza_pv = pd.ExcelFile(bnetza_pv_xls)
+# ## 2.5 Setup data types of the original data
+# 
+# Instead of letting pandas infer the type of every column, the data types are specified per data source and applied while reading. The types are given for the translated column names and assigned to the original column names by means of the column translation list. Text columns with only a few distinct values, e.g. energy_source or voltage_level, are read as categoricals. All columns translated to a name ending with "_date" are parsed with the explicit date format of the data source.
+
+# In[ ]:
+
+# Data types of the German columns
+dtype_DE = {'energy_source': 'category',
+            'voltage_level': 'category',
+            'dso': 'category',
+            'tso': 'category',
+            'federal_state': 'category',
+            'notification_reason': 'category',
+            'postcode': str,
+            'municipality_code': str,
+            'eeg_id': str,
+            'bnetza_id': str,
+            'electrical_capacity_kW': np.float64,
+            'thermal_capacity_kW': np.float64,
+            'utm_east': np.float64,
+            'utm_north': np.float64}
+
+# Data types of the Danish columns
+dtype_DK = {'dso': 'category',
+            'manufacturer': 'category',
+            'model': 'category',
+            'municipality': 'category',
+            'gsrn_id': str,
+            'postcode': str,
+            'municipality_code': str,
+            'electrical_capacity_kW': np.float64,
+            'utm_east': np.float64,
+            'utm_north': np.float64,
+            'hub_height': np.float64,
+            'rotor_diameter': np.float64}
+
+# Schema per data source. Dates in Excel files are already typed, thus 
+# no date format is given for them.
+source_schemas = {
+    'netztransparenz': {'country': 'DE', 'dtype': dtype_DE, 'date_format': '%d.%m.%Y'},
+    'bnetza': {'country': 'DE', 'dtype': dtype_DE, 'date_format': None},
+    'bnetza_pv': {'country': 'DE', 'dtype': dtype_DE, 'date_format': None},
+    'DK_ens': {'country': 'DK', 'dtype': dtype_DK, 'date_format': None},
+    'DK_energinet': {'country': 'DK', 'dtype': dtype_DK, 'date_format': None}}
+
+
+# In[ ]:
+
+def read_schema(source, converters=None):
+    """This function returns the dtype dictionary and the date columns of
+    a data source, both given by the original column names. Columns with
+    a converter are left out."""
+    schema = source_schemas[source]
+    translation = columnnames[columnnames['country'] == schema['country']]
+    dtype = {}
+    dates = []
+    for original_name, opsd_name in zip(translation['original_name'],
+                                        translation['opsd_name']):
+        if not isinstance(original_name, str) or not isinstance(opsd_name, str):
+            continue
+        if converters and original_name in converters:
+            continue
+        if opsd_name in schema['dtype']:
+            dtype[original_name] = schema['dtype'][opsd_name]
+        elif schema['date_format'] and opsd_name.endswith('_date'):
+            dates.append(original_name)
+    return dtype, dates
+
+
+def parse_dates(df, columns, date_format):
+    """This function converts the date columns of df using date_format.
+    Values which do not match the format are parsed one by one with the 
+    day first, values which cannot be parsed at all become NaT. Thus each
+    value is converted the same way, independent of the other rows."""
+    for column in df.columns.intersection(columns):
+        dates = pd.to_datetime(df[column], format=date_format, errors='coerce')
+        unmatched = dates.isnull() & df[column].notnull()
+        if unmatched.any():
+            values = df.loc[unmatched, column]
+            fallback = {value: pd.to_datetime(value, dayfirst=True, errors='coerce')
+                        for value in pd.unique(values)}
+            dates[unmatched] = values.map(fallback)
+            failed = (dates[unmatched].isnull() 
+                      & (values.astype(str).str.strip() != ''))
+            if failed.any():
+                logger.warning('%d values of column %s could not be parsed '
+                               'as date', failed.sum(), column)
+        df[column] = dates
+    return df
+
+
+# ## 2.6 Columnar cache of Excel files
+# 
+# Parsing the Excel workbooks is by far the slowest step of reading the original data. Therefore each sheet is converted to a Parquet file in the folder input/parquet_cache when it is read for the first time. The name of the Parquet file is derived from the checksum of the workbook and the options used for reading, so following runs memory-map the Parquet file instead of parsing the workbook as long as neither has changed. Columns of mixed types are stored as strings by dataframe_to_arrow from arrow_tables.py.
+
+# In[ ]:
+
+parquet_cache = 'input/parquet_cache'
+os.makedirs(parquet_cache, exist_ok=True)
+
+
+def cached_checksum(filepath):
+    """This function returns the checksum of a file, taken from its 
+    download record if the file is a verified download."""
+    if is_cached(filepath):
+        with open(filepath + '.download.json') as file:
+            return json.load(file)['sha256']
+    return file_checksum(filepath)
+
+
+def read_excel_cached(filepath, sheets=None, **kwargs):
+    """This function reads the given sheets (default: all sheets) of an 
+    Excel file with the keyword arguments of ExcelFile.parse and returns 
+    an OrderedDict of DataFrames. Sheets are read from the Parquet cache 
+    if available and added to it otherwise."""
+    checksum = cached_checksum(filepath)
+    basename = posixpath.basename(filepath)
+    options = hashlib.sha256(repr(sorted(kwargs.items())).encode('utf-8'))
+    workbook = None
+
+    # The sheet names are cached as well, so the workbook is not opened
+    sheetspath = os.path.join(parquet_cache, 
+                              '{0}-{1}.sheets.json'.format(basename, checksum))
+    if sheets is None:
+        if os.path.exists(sheetspath):
+            with open(sheetspath) as file:
+                sheets = json.load(file)
+        else:
+            workbook = pd.ExcelFile(filepath)
+            sheets = workbook.sheet_names
+            with open(sheetspath, 'w') as file:
+                json.dump(sheets, file)
+
+    dataframes = OrderedDict()
+    for sheet in sheets:
+        key = hashlib.sha256((checksum + str(sheet)).encode('utf-8'))
+        key.update(options.digest())
+        parquetpath = os.path.join(parquet_cache, '{0}-{1}.parquet'.format(
+            basename, key.hexdigest()))
+
+        if not os.path.exists(parquetpath):
+            if workbook is None:
+                workbook = pd.ExcelFile(filepath)
+            print('Converting', sheet, 'of', basename, 'to', parquetpath)
+            df = workbook.parse(sheet, **kwargs)
+            pq.write_table(dataframe_to_arrow(df), parquetpath + '.part')
+            os.replace(parquetpath + '.part', parquetpath)
+
+        # A converted sheet is read from the Parquet file as well, so the 
+        # first run returns the same data as the following runs
+        print('Reading', sheet, 'from', parquetpath)
+        dataframes[sheet] = pq.read_table(parquetpath,
+                                          memory_map=True).to_pandas()
+    return dataframes
+
+
+# ## 2.7 Conversion of coordinates
+# 
+# Coordinates given in the UTM format are converted to latitude and longitude for whole columns at once. As the conversion depends on the UTM zone, the coordinates are converted in one batch per zone. Coordinates which can not be converted are set to NaN and reported per row, all other coordinates of the column are converted regardless.
+
+# In[ ]:
+
+def utm_to_latlon(easting, northing, zone):
+    """This function converts arrays of UTM coordinates to arrays of 
+    latitude and longitude. zone is either an array or one zone number 
+    for all coordinates. Additionally an array with the reason why a 
+    coordinate could not be converted (None if it was) is returned."""
+    easting = np.asarray(easting, dtype=np.float64)
+    northing = np.asarray(northing, dtype=np.float64)
+    zone = np.broadcast_to(np.asarray(zone, dtype=np.float64), easting.shape)
+
+    lat = np.full(easting.shape, np.nan)
+    lon = np.full(easting.shape, np.nan)
+    errors = np.full(easting.shape, None, dtype=object)
+
+    # Missing coordinates are no errors, they simply stay NaN
+    notnull = ~(np.isnan(easting) | np.isnan(northing) | np.isnan(zone))
+    with np.errstate(invalid='ignore'):
+        errors[notnull & ((zone < 1) | (zone > 60) | (zone % 1 != 0))] = 'invalid utm_zone'
+        errors[notnull & ((easting < 100000) | (easting >= 1000000))] = 'utm_east out of range'
+        errors[notnull & ((northing < 0) | (northing > 10000000))] = 'utm_north out of range'
+    valid = notnull & pd.isnull(errors)
+
+    for zone_number in np.unique(zone[valid]):
+        batch = valid & (zone == zone_number)
+        try:
+            lat[batch], lon[batch] = utm.to_latlon(easting[batch], 
+                                                   northing[batch],
+                                                   int(zone_number), 'U')
+        except Exception as e:
+            errors[batch] = 'zone {0:.0f}: {1}'.format(zone_number, e)
+    return lat, lon, errors
+
+
+def report_conversion_errors(errors, index):
+    """This function prints the number of coordinates which could not be 
+    converted per reason together with the first affected rows."""
+    errors = pd.Series(errors, index=index).dropna()
+    for reason, rows in errors.groupby(errors):
+        print('{0} coordinates not converted ({1}), e.g. rows {2}'.format(
+            len(rows), reason, list(rows.index[:5])))
+
+
+# Coordinates given as text in tuple format, e.g. "(48.85, 2.35)", are split into latitude and longitude for the whole column at once.
+
+# In[ ]:
+
+def split_geo_point(points):
+    """This function splits a column of "(lat, lon)" strings into float 
+    Series of latitude and longitude. Entries which are missing or not in 
+    this format result in NaN."""
+    latlon = points.str.extract(r'^\s*\(?([^,()]+),([^,()]+?)\)?\s*$',
+                                expand=True)
+    lat = pd.to_numeric(latlon[0].str.strip(), errors='coerce')
+    lon = pd.to_numeric(latlon[1].str.strip(), errors='coerce')
+    return lat, lon
+
+
+# Often more than one source of coordinates is available for a power plant, e.g. its own UTM coordinates and the centroid of its postcode area. The coordinates are then taken from the most precise source available, in the order plant coordinates, postcode centroid, municipality centroid. The column coordinate_source records which source the coordinates of each power plant stem from.
+
+# In[ ]:
+
+def resolve_coordinates(df, sources):
+    """This function sets the columns lat and lon of df from a list of 
+    (name, lat, lon) sources, given in order of priority with lat and lon
+    aligned to the rows of df. Each row gets the coordinates of the first
+    source which has both values, the name of this source is stored in 
+    the column coordinate_source."""
+    lat = np.full(len(df), np.nan)
+    lon = np.full(len(df), np.nan)
+    codes = np.full(len(df), -1, dtype=np.int8)
+
+    for code, (name, source_lat, source_lon) in enumerate(sources):
+        source_lat = np.asarray(source_lat, dtype=np.float64)
+        source_lon = np.asarray(source_lon, dtype=np.float64)
+        fill = np.isnan(lat) & ~np.isnan(source_lat) & ~np.isnan(source_lon)
+        lat[fill] = source_lat[fill]
+        lon[fill] = source_lon[fill]
+        codes[fill] = code
+
+    df['lat'] = lat
+    df['lon'] = lon
+    df['coordinate_source'] = pd.Categorical.from_codes(
+        codes, [name for name, _, _ in sources])
+
+
+# ## 2.8 Translation of values
+# 
+# The values of the original data are translated with the dictionaries of the value translation list. Instead of replacing values in every cell of a DataFrame, only text columns containing at least one of the original values are translated. Columns containing only text are converted to categoricals and only their distinct values (categories) are translated, so the running time depends on the number of distinct values rather than on the number of rows and columns. Columns of mixed types, e.g. the French number of installations with _s_ for less than 3 installations, keep their type and only the cells with an original value are replaced.
+
+# In[ ]:
+
+def translate_series(series, value_dict):
+    """This function translates the values of a Series according to 
+    value_dict and returns it as categorical Series. Values without 
+    translation are kept."""
+    if series.dtype.name != 'category':
+        series = series.astype('category')
+    translated = pd.Index([value_dict.get(category, category)
+                           for category in series.cat.categories])
+
+    # Several original values may be translated to the same value, thus 
+    # the codes are mapped to the distinct translated values
+    categories = translated.dropna().unique()
+    recode = categories.get_indexer(translated)
+    codes = series.cat.codes.values
+    codes = np.where(codes < 0, -1, recode[codes])
+    return pd.Series(pd.Categorical.from_codes(codes, categories),
+                     index=series.index, name=series.name)
+
+
+def translate_values(df, value_dict):
+    """This function translates in place all text columns of df which 
+    contain at least one of the original values of value_dict. Columns of
+    mixed types keep their type."""
+    for column, series in df.items():
+        if series.dtype.name == 'category':
+            values = series.cat.categories
+        elif series.dtype == object:
+            values = pd.unique(series.values)
+        else:
+            continue
+        found = [value for value in values if value in value_dict]
+        if not found:
+            continue
+        if series.dtype == object and not all(isinstance(value, str) 
+                                              for value in values 
+                                              if pd.notnull(value)):
+            df[column] = series.replace({value: value_dict[value] 
+                                         for value in found})
+        else:
+            df[column] = translate_series(series, value_dict)
 
-# Combine all PV BNetzA sheets into one DataFrame
-print('Concatenating bnetza_pv')
-bnetza_pv_df = pd.concat(bnetza_pv.parse(sheet, skiprows=10,
-                                         converters={'Anlage \nPLZ': str}
-                                         ) for sheet in bnetza_pv.sheet_names)
 
-# Drop not needed NULL "Unnamed:" column
-bnetza_pv_df = bnetza_pv_df.drop(bnetza_pv_df.columns[[7]], axis=1)
+
+# ## 2.9 Stage cache
+# 
+# The processing of each country is divided into named stages: read, translate, geocode and merge. The result of each stage is stored in the folder input/stage_cache and identified by a hash of everything the stage depends on: the content of its input files and DataFrames, its further arguments like the translation dictionaries, the code of the stage function and of the functions and settings it refers to, and the code_version below. A stage is only run if one of these has changed, otherwise its result is loaded from the cache. Thus, for example, changing the French georeferencing does not require reading the German Excel files again. The least recently used results are deleted as soon as the cache exceeds stage_cache_size.
+
+# In[ ]:
+
+stage_cache = 'input/stage_cache'
+os.makedirs(stage_cache, exist_ok=True)
+
+# Maximum size of the stage cache in bytes
+stage_cache_size = 4 * 1024 ** 3
+
+# Increase to invalidate all cached stages
+code_version = 1
+
+
+def content_hash(obj, sha256=None):
+    """This function updates and returns a sha256 hash object with the 
+    content of obj. Files are hashed by their content, DataFrames and 
+    Series by their values."""
+    if sha256 is None:
+        sha256 = hashlib.sha256()
+    sha256.update(type(obj).__name__.encode('utf-8'))
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        sha256.update(repr(obj.dtypes if isinstance(obj, pd.DataFrame) 
+                           else (obj.name, obj.dtype)).encode('utf-8'))
+        sha256.update(pd.util.hash_pandas_object(obj).values.tobytes())
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            content_hash(key, sha256)
+            content_hash(value, sha256)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            content_hash(item, sha256)
+    elif isinstance(obj, str) and os.path.isfile(obj):
+        sha256.update(cached_checksum(obj).encode('utf-8'))
+    else:
+        sha256.update(repr(obj).encode('utf-8'))
+    return sha256
+
+
+def code_names(code):
+    """This function returns the names used by a code object, including 
+    those of nested functions and comprehensions."""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= code_names(const)
+    return names
+
+
+def code_hash(func, sha256=None, seen=None):
+    """This function updates and returns a sha256 hash object with the 
+    source code of func and of the functions and settings it refers to."""
+    if sha256 is None:
+        sha256 = hashlib.sha256()
+    if seen is None:
+        seen = set()
+    try:
+        sha256.update(inspect.getsource(func).encode('utf-8'))
+    except (OSError, TypeError):
+        sha256.update(func.__code__.co_code)
+
+    # Names are sorted, as the order of a set differs between sessions
+    for name in sorted(code_names(func.__code__) - seen):
+        seen.add(name)
+        obj = func.__globals__.get(name)
+        if inspect.isfunction(obj):
+            code_hash(obj, sha256, seen)
+        elif isinstance(obj, (bool, int, float, str, list, tuple, dict, 
+                              pd.DataFrame)):
+            content_hash(obj, sha256)
+        elif isinstance(obj, type(re.compile(''))):
+            content_hash((obj.pattern, obj.flags), sha256)
+    return sha256
+
+
+def evict_stage_cache(max_size=stage_cache_size):
+    """This function deletes the least recently used stage results until
+    the stage cache is not larger than max_size."""
+    entries = []
+    for filename in os.listdir(stage_cache):
+        path = os.path.join(stage_cache, filename)
+        if filename.endswith('.pickle'):
+            # The countries are processed in parallel, thus another process 
+            # may have deleted the file in the meantime
+            try:
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except FileNotFoundError:
+                pass
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def run_stage(name, func, *args):
+    """This function returns the result of func(*args). The result is 
+    loaded from the stage cache if the stage has already been run with 
+    the same code and arguments, otherwise it is added to the cache."""
+    start = time.time()
+    sha256 = hashlib.sha256('{0}-{1}'.format(name, code_version).encode('utf-8'))
+    code_hash(func, sha256)
+    content_hash(args, sha256)
+    path = os.path.join(stage_cache, '{0}-{1}.pickle'.format(name, 
+                                                             sha256.hexdigest()))
+
+    if os.path.exists(path):
+        result = pd.read_pickle(path)
+        # The modification time marks the last use of a result
+        os.utime(path)
+        print('Stage {0} loaded from cache ({1:.1f} s)'.format(
+            name, time.time() - start))
+        return result
+
+    reset_peak_rss()
+    result = func(*args)
+    pd.to_pickle(result, path + '.part')
+    os.replace(path + '.part', path)
+    evict_stage_cache()
+    rss = peak_rss()
+    print('Stage {0} processed ({1:.1f} s, peak memory {2})'.format(
+        name, time.time() - start, 
+        'n/a' if rss is None else '{0:.0f} MB'.format(rss / 1024 ** 2)))
+    return result
+
+
+# ## 2.10 Parallel processing of the countries
+# 
+# The countries share nothing but the translation dictionaries, thus their processing is run in parallel. Each country is a task, which is started as soon as the tasks it depends on are finished and receives their results as arguments. If a task fails, the error is logged and only the tasks depending on it are skipped, all other tasks are continued. The number of tasks run at the same time is set by country_workers.
+
+# In[ ]:
+
+# Number of countries processed at the same time
+country_workers = 4
+
+
+def timed_call(func, *args):
+    """This function returns the result of func(*args) and the time in 
+    seconds it took."""
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def run_tasks(tasks, max_workers=country_workers):
+    """This function runs the tasks in parallel in the order of their 
+    dependencies. tasks is an OrderedDict of the task names and tuples of
+    the task function and the names of the tasks whose results it gets as
+    arguments. It returns OrderedDicts of the results of the successful 
+    and of the errors of the failed or skipped tasks."""
+    results = OrderedDict()
+    failed = OrderedDict()
+    pending = OrderedDict(tasks)
+    running = {}
+    start = time.time()
+    with process_pool(max_workers) as executor:
+        while pending or running:
+            for name, (func, dependencies) in list(pending.items()):
+                if any(dependency in failed for dependency in dependencies):
+                    failed[name] = 'skipped, as a task it depends on failed'
+                    logger.error('Task %s skipped, as a task it depends on '
+                                 'failed', name)
+                    del pending[name]
+                elif all(dependency in results for dependency in dependencies):
+                    args = [results[dependency] for dependency in dependencies]
+                    running[executor.submit(timed_call, func, *args)] = name
+                    del pending[name]
+
+            if not running:
+                # The remaining tasks depend on unknown tasks
+                for name in pending:
+                    failed[name] = 'skipped, unknown dependency'
+                    logger.error('Task %s skipped, unknown dependency', name)
+                break
+
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name], seconds = future.result()
+                    print('Task {0} finished ({1:.1f} s)'.format(name, seconds))
+                except Exception as error:
+                    failed[name] = error
+                    logger.exception('Task %s failed', name)
+
+    print('{0} tasks finished, {1} failed ({2:.1f} s)'.format(
+        len(results), len(failed), time.time() - start))
+    return results, failed
+
+
+# ## 2.11 Geocoding index
+# 
+# The coordinates of the postcode and municipality areas of each country are stored in a geocoding index per country. It is built once from the postcode or municipality table, when the task of the country first needs it, and stored as memory-mappable Arrow file in the folder input. Thus a broken table only fails the task of its country. The file name contains a hash of geocoding_index_version and of the table, thus the index is built again if the table or the way it is built changes. The function geocode returns the coordinates for a whole column of postcodes or municipality codes at once.
+# 
+# The following tables are used:
+# * DE: postcodes, see _3.1.7 Georeferencing_
+# * DK: postcodes, see _3.2.5 Georeferencing_
+# * FR: municipality codes, see _3.3.5 Georeferencing_
+
+# In[ ]:
+
+# Increase to rebuild the geocoding index
+geocoding_index_version = 1
+
+geocoding_sources = {'DE': 'input/de_tso_postcode_gps.csv',
+                     'DK': filepaths['DK_geo'],
+                     'FR': filepaths['FR_geo']}
+
+
+def read_geocoding_table(country):
+    """This function reads the postcode or municipality table of a country
+    and returns a DataFrame with the columns key_type, key, lat and lon."""
+    if country == 'DE':
+        # Read generated postcode/location file
+        DE_geo = pd.read_csv(geocoding_sources['DE'],
+                             sep=';',
+                             header=0,
+                             dtype={'postcode': str})
+        return DE_geo.assign(key_type='postcode', key=DE_geo['postcode'])
+
+    if country == 'DK':
+        # Read postcode/location file from geonames, add column names as 
+        # defined in associated readme file
+        with zipfile.ZipFile(geocoding_sources['DK']) as zip_DK_geo:
+            DK_geo = pd.read_csv(zip_DK_geo.open('DK.txt'), sep='\t', 
+                                 header=None, dtype={1: str})
+        DK_geo.columns =  ['country_code','postcode','place_name','admin_name1',
+                           'admin_code1','admin_name2','admin_code2','admin_name3',
+                           'admin_code3','lat','lon','accuracy']
+        return DK_geo.assign(key_type='postcode', key=DK_geo['postcode'])
+
+    if country == 'FR':
+        # Read INSEE Code Data and split in latitude/longitude
+        FR_geo = pd.read_csv(geocoding_sources['FR'],
+                             sep=';',
+                             header=0,
+                             dtype={'INSEE_COM': str})
+        FR_geo['lat'], FR_geo['lon'] = split_geo_point(FR_geo['Geo Point'])
+        return FR_geo.assign(key_type='municipality', key=FR_geo['INSEE_COM'])
+
+    raise ValueError('No geocoding table for {0}'.format(country))
+
+
+def build_geocoding_index(country):
+    """This function returns the geocoding index of a country as DataFrame
+    with the columns country, key_type, key, lat and lon."""
+    columns = ['country', 'key_type', 'key', 'lat', 'lon']
+    index = read_geocoding_table(country).assign(country=country)[columns]
+
+    # Drop entries without key and possible duplicates of the same postcode 
+    # or municipality
+    index = index.dropna(subset=['key'])
+    index = index.drop_duplicates(['country', 'key_type', 'key'], keep='last')
+    return index.sort_values(['country', 'key_type', 'key']).reset_index(drop=True)
+
+
+def geocoding_index_path(country):
+    """This function returns the path of the geocoding index of a country 
+    and builds the index if it does not exist yet."""
+    sha256 = content_hash([geocoding_index_version, country, 
+                           geocoding_sources[country]])
+    path = 'input/geocoding_index-{0}-{1}.arrow'.format(country,
+                                                        sha256.hexdigest()[:16])
+    if not os.path.exists(path):
+        print('Building geocoding index of', country)
+        table = pa.Table.from_pandas(build_geocoding_index(country), 
+                                     preserve_index=False)
+        # The part file is unique per process, as the tasks run in parallel
+        partpath = '{0}.{1}.part'.format(path, os.getpid())
+        with pa.OSFile(partpath, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(partpath, path)
+    return path
+
+
+def geocode(index_path, country, key_type, keys):
+    """This function returns arrays of the latitude and longitude of the 
+    postcodes or municipality codes in keys, NaN if a key is not in the 
+    geocoding index. The keys are joined with the index by categorical 
+    codes."""
+    with pa.memory_map(index_path) as source:
+        index = pa.ipc.open_file(source).read_all().to_pandas()
+    index = index[(index['country'] == country) & (index['key_type'] == key_type)]
+
+    keys = pd.Series(keys).astype(object)
+    keys = keys.where(keys.isnull(), keys.astype(str))
+    codes = pd.Categorical(keys, categories=index['key'].values).codes
+
+    found = codes >= 0
+    lat = np.full(len(codes), np.nan)
+    lon = np.full(len(codes), np.nan)
+    lat[found] = index['lat'].values[codes[found]]
+    lon[found] = index['lon'].values[codes[found]]
+    return lat, lon
+
+
+# ## 2.12 Memory budget mode
+# 
+# The German registers are large and are copied several times while they are merged. If memory_budget is set in _2.1 Choose download option_, their text columns are stored as categoricals (columns of mixed types, e.g. postcodes read as numbers in one register and as text in another, stay object columns), the capacities and coordinates as float32 and integer columns as the smallest possible integer type. The categories of the six registers are aligned before they are merged, so the merged DataFrame keeps the categoricals. The UTM coordinates stay float64, as the zone is removed from some of them by its digits (see _3.1.7 Georeferencing_).
+# 
+# The peak memory (resident set size) of each stage is reported by run_stage. This is only possible on Linux.
+
+# In[ ]:
+
+# Columns which are stored as float32 in memory budget mode
+float32_columns = ['electrical_capacity_kW', 'thermal_capacity_kW', 
+                   'electrical_capacity', 'thermal_capacity', 'lat', 'lon']
+# Columns which are stored as small integers in memory budget mode
+integer_columns = ['utm_zone']
+
+
+def is_text(series):
+    """This function checks whether all values of an object Series, apart
+    from missing values, are strings."""
+    return all(isinstance(value, str) for value in pd.unique(series.dropna()))
+
+
+def compact_frame(df):
+    """This function returns df with text columns as categoricals, the 
+    float32_columns as float32 and the integer_columns as the smallest 
+    integer type, or float32 if they contain missing values. Columns of 
+    mixed types stay object columns, Arrow can not store them as 
+    categoricals."""
+    df = df.copy(deep=False)
+    for column, series in df.items():
+        if series.dtype == object:
+            if is_text(series):
+                df[column] = series.astype('category')
+        elif column in integer_columns and series.notnull().all():
+            df[column] = pd.to_numeric(series, downcast='integer')
+        elif column in float32_columns + integer_columns and series.dtype.kind == 'f':
+            df[column] = series.astype(np.float32)
+    return df
+
+
+def concat_frames(frames):
+    """This function concatenates the DataFrames. In memory budget mode, the
+    DataFrames are compacted and the categories of the columns which are
+    categoricals in all DataFrames are aligned before, so these columns 
+    stay categoricals."""
+    if not memory_budget:
+        return pd.concat(frames)
+
+    frames = [compact_frame(df) for df in frames]
+    columns = pd.Index([])
+    for df in frames:
+        columns = columns.append(df.columns.difference(columns, sort=False))
+
+    for column in columns:
+        # Columns which are no categoricals in all DataFrames, e.g. dates in
+        # one and text in another, are left to pd.concat
+        series = [df[column] for df in frames if column in df]
+        if not all(column_series.dtype.name == 'category' 
+                   for column_series in series):
+            continue
+        dtype = pd.api.types.CategoricalDtype(pd.Index(np.concatenate(
+            [column_series.cat.categories for column_series in series])).unique())
+        for df in frames:
+            # Missing columns are added as empty categoricals
+            df[column] = (df[column].astype(dtype) if column in df 
+                          else pd.Categorical([np.nan] * len(df), dtype=dtype))
+    # The columns are ordered as by pd.concat without aligned categoricals
+    return pd.concat(frames, copy=False).reindex(columns=columns, copy=False)
+
+
+def reset_peak_rss():
+    """This function resets the peak memory of the process, if possible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """This function returns the peak memory of the process in bytes since
+    the last reset, None if it is not available."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+# ## 2.13 Processed data as Parquet dataset
+# 
+# The processed data of all countries is saved as one Parquet dataset in the folder output/renewable_power_plants/processed, partitioned by country and energy source, i.e. in a folder per country and per energy source. The Parquet files contain statistics of each column, thus only the columns and row groups needed have to be read, e.g. the commissioning dates and capacities of the German wind turbines:
+# 
+#     read_processed('DE', columns=['commissioning_date', 'electrical_capacity'],
+#                    filters=[('energy_source', '=', 'Wind')])
+
+# In[ ]:
+
+processed_dataset = 'output/renewable_power_plants/processed'
+
+
+def save_processed(df, country):
+    """This function replaces the data of a country in the Parquet dataset
+    by df. The index of df is saved as well."""
+    # Remove the old data, which could contain energy sources not in df
+    country_path = os.path.join(processed_dataset, 'country=' + country)
+    if os.path.exists(country_path):
+        shutil.rmtree(country_path)
+    table = dataframe_to_arrow(df.assign(country=country), preserve_index=True)
+    pq.write_to_dataset(table, processed_dataset,
+                        partition_cols=['country', 'energy_source'])
+
+
+def read_processed(country, columns=None, filters=None):
+    """This function reads the data of a country from the Parquet dataset.
+    Only the given columns and the row groups matching the filters are
+    read, filters are given in the format of pyarrow.parquet.read_table."""
+    filters = [('country', '=', country)] + list(filters or [])
+    df = pq.read_table(processed_dataset, columns=columns, 
+                       filters=filters).to_pandas()
+    return df.drop('country', axis=1, errors='ignore')
+
+
+# ## 2.14 BMWi statistics for validation
+# 
+# The installed capacity per energy source and year published by the BMWi is used in the validation to compare the processed data with. The workbook is downloaded together with the original data, the table of sheet 4 is converted once to the small Parquet file input/bmwi_stat.parquet, which the validation reads from disk. The conversion is skipped as long as the Parquet file is newer than the workbook or the checksum of the workbook, stored in the Parquet file, matches.
+
+# In[ ]:
+
+bmwi_stat_path = 'input/bmwi_stat.parquet'
+
+
+def bmwi_stat_is_current(filepath, parquetpath=bmwi_stat_path):
+    """This function checks whether the Parquet file was converted from the
+    current BMWi workbook, i.e. it is newer than the workbook or the 
+    checksum of the workbook it was converted from matches."""
+    if not os.path.exists(parquetpath):
+        return False
+    if os.path.getmtime(parquetpath) > os.path.getmtime(filepath):
+        return True
+    metadata = pq.read_schema(parquetpath).metadata or {}
+    return metadata.get(b'source_sha256') == cached_checksum(filepath).encode()
+
+
+def convert_bmwi_stat(filepath, parquetpath=bmwi_stat_path):
+    """This function converts the installed capacities of the BMWi 
+    workbook to a table of years and energy sources, unless the Parquet 
+    file is current, and returns the table read from the Parquet file."""
+    if bmwi_stat_is_current(filepath, parquetpath):
+        return pq.read_table(parquetpath).to_pandas()
+
+    bmwi_stat = read_excel_cached(filepath, ['4'], skiprows=7, 
+                                  skip_footer=8)['4']
+
+    # Transform data frame and set column names
+    stat = bmwi_stat.T
+    stat.columns = ['bmwi_hydro', 'bmwi_wind_onshore', 'bmwi_wind_offshore',
+                    'bmwi_solar', 'bmwi_biomass', 'bmwi_biomass_liquid',
+                    'bmwi_biomass_gas', 'bmwi_sewage_gas', 'bmwi_landfill_gas',
+                    'bmwi_geothermal', 'bmwi_total']
+
+    # Drop Null column and set index as year
+    stat = stat.drop(stat.index[[0]]).apply(pd.to_numeric, errors='coerce')
+    stat.index = pd.Index(pd.to_datetime(stat.index, format="%Y").year, 
+                          name='year')
+
+    # The checksum of the workbook is stored with the table
+    table = pa.Table.from_pandas(stat, preserve_index=True)
+    table = table.replace_schema_metadata(dict(
+        table.schema.metadata, source_sha256=cached_checksum(filepath)))
+    pq.write_table(table, parquetpath + '.part')
+    os.replace(parquetpath + '.part', parquetpath)
+    return pq.read_table(parquetpath).to_pandas()
+
+
+# In[ ]:
+
+bmwi_stat = convert_bmwi_stat(filepaths['bmwi_stat'])
+
+
+# # 3. Download and process per country
+# 
+# For one country after the other, the original data is downloaded, read, processed, translated, eventually georeferenced and saved. If respective files are already in the local folder, these will be utilized.
+# To process the provided data [pandas DataFrame](http://pandas.pydata.org/pandas-docs/stable/dsintro.html#dataframe) is applied.<br>
+# The processing steps of each country are defined as functions, which are run as stages of the stage cache (see _2.9 Stage cache_). The stages of a country are combined in one task per country. All countries are processed in parallel in _3.5 Process all countries_.
+
+# ## 3.1 Germany DE
+
+# ### 3.1.1 Download and read
+# The data which will be processed below is provided by the following data sources:
+# 
+# **[Netztransparenz.de](https://www.netztransparenz.de/de/Anlagenstammdaten.htm)** - Official grid transparency platform from the German TSOs (50Hertz, Amprion, TenneT and TransnetBW).
+# 
+# **Bundesnetzagentur (BNetzA)** - German Federal Network Agency for Electricity, Gas, Telecommunications, Posts and Railway (Data for [roof-mounted PV power plants](http://www.bundesnetzagentur.de/cln_1422/DE/Sachgebiete/ElektrizitaetundGas/Unternehmen_Institutionen/ErneuerbareEnergien/Photovoltaik/DatenMeldgn_EEG-VergSaetze/DatenMeldgn_EEG-VergSaetze_node.html) and for [all other renewable energy power plants](http://www.bundesnetzagentur.de/cln_1412/DE/Sachgebiete/ElektrizitaetundGas/Unternehmen_Institutionen/ErneuerbareEnergien/Anlagenregister/Anlagenregister_Veroeffentlichung/Anlagenregister_Veroeffentlichungen_node.html))
+
+# In[49]:
+
+try:     
+    zipfile.ZipFile(filepaths['netztransparenz']).close()
+except zipfile.BadZipFile:
+    raise FileNotFoundError('One of the Zip File is corrupted! Delete them                                  Also, check your opsd password!')
+
+
+# The registers of the four TSOs are read in parallel, one process per TSO. Instead of pickling the DataFrames, each process writes its result as Arrow file, which is then memory-mapped by the notebook.
+# 
+# The registers can be read at once or, if processing_mode is set to 'stream' in _2.1 Choose download option_, in chunks of csv_chunksize rows (see _Streaming mode_ in 3.1.7). In both cases the registers are parsed the same way: Read at once, pandas infers the type of each column without given data type over the whole file. In stream mode, where pandas infers the types per chunk, they are determined for the whole file in a first pass over the chunks by resolve_tso_dtypes with the same result; text in any chunk makes the whole column text and integers and decimals make it decimal. The date columns are parsed by parse_dates value by value, so the result does not depend on the other rows of a chunk either.
+
+# In[50]:
+
+# Names of the TSOs whose registers are contained in the Netztransparenz zip file
+tso_names = ['Amprion', '50Hertz', 'TenneT', 'TransnetBW']
+
+# Options for reading the registers of the TSOs
+tso_csv_options = {'sep': ';',
+                   'thousands': '.',
+                   'decimal': ',',
+                   'header': 0,
+                   'encoding': 'cp1252'}
+
+
+def tso_filename(tso):
+    """This function returns the name of the register of a TSO in the 
+    Netztransparenz zip file."""
+    return tso + '_Anlagenstammdaten_2015.csv'
+
+
+def resolve_tso_dtypes(zip_path, tso):
+    """This function returns the dtype of each column of the register of 
+    a TSO. The types of the columns without given data type are determined
+    in a pass over the chunks of the register."""
+    dtype = read_schema('netztransparenz')[0]
+    with zipfile.ZipFile(zip_path) as netztransparenz_zip:
+        header = pd.read_csv(netztransparenz_zip.open(tso_filename(tso)), 
+                             nrows=0, **tso_csv_options).columns
+        inferred = OrderedDict()
+        for chunk in pd.read_csv(netztransparenz_zip.open(tso_filename(tso)),
+                                 usecols=lambda column: column not in dtype,
+                                 chunksize=csv_chunksize,
+                                 **tso_csv_options):
+            for column, column_dtype in chunk.dtypes.items():
+                inferred.setdefault(column, set()).add(column_dtype)
+
+    resolved = OrderedDict()
+    for column in header:
+        column_dtypes = inferred.get(column, set())
+        if column in dtype:
+            resolved[column] = dtype[column]
+        elif len(column_dtypes) == 1:
+            resolved[column] = column_dtypes.pop()
+        elif column_dtypes and all(column_dtype.kind in 'iuf' 
+                                   for column_dtype in column_dtypes):
+            resolved[column] = np.float64
+        else:
+            # Text in any chunk makes the whole column text
+            resolved[column] = str
+    return resolved
+
+
+def read_tso_frames(zip_path, tso, dtype, chunksize=None):
+    """This function yields the register of a TSO, parsed with dtype and 
+    with converted dates, in chunks of chunksize rows or at once
+    if chunksize is None."""
+    dates = read_schema('netztransparenz')[1]
+    date_format = source_schemas['netztransparenz']['date_format']
+    with zipfile.ZipFile(zip_path) as netztransparenz_zip:
+        reader = pd.read_csv(netztransparenz_zip.open(tso_filename(tso)),
+                             dtype=dtype,
+                             chunksize=chunksize,
+                             low_memory=False,
+                             **tso_csv_options)
+        for chunk in ([reader] if chunksize is None else reader):
+            yield parse_dates(chunk, dates, date_format)
+
+
+def read_tso_csv(zip_path, tso, arrow_dir):
+    """This function reads the register of one TSO from the Netztransparenz 
+    zip file, stores it as Arrow file in arrow_dir and returns its path."""
+    print('Reading', tso_filename(tso))
+    # Read at once, pandas infers the types of the columns without given 
+    # type over the whole register, as resolve_tso_dtypes does in chunks
+    df = next(read_tso_frames(zip_path, tso, read_schema('netztransparenz')[0]))
+
+    arrow_path = os.path.join(arrow_dir, tso + '.arrow')
+    table = dataframe_to_arrow(df)
+    with pa.OSFile(arrow_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return arrow_path
+
+
+def read_arrow(arrow_path):
+    """This function memory-maps an Arrow file and returns it as DataFrame."""
+    with pa.memory_map(arrow_path) as source:
+        return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+# In[51]:
+
+def read_bnetza(bnetza_path, bnetza_pv_path):
+    """This function reads the registers of the BNetzA and returns them as 
+    OrderedDict of DataFrames by data source."""
+    frames = OrderedDict()
+
+    # Read BNetzA register
+    print('Reading bnetza - 2016_06_Veroeff_AnlReg.xls')
+    converters = {'4.9 Postleit-zahl': str, 'Gemeinde-Schlüssel': str}
+    frames['BNetzA'] = read_excel_cached(bnetza_path,
+                                         ['Gesamtübersicht'],
+                                         header=0,
+                                         dtype=read_schema('bnetza', converters)[0],
+                                         converters=converters)['Gesamtübersicht']
+
+    # Read BNetzA-PV register
+    print('Reading bnetza_pv - Meldungen_Aug-Mai2016.xls')
+    converters = {'Anlage \nPLZ': str}
+    bnetza_pv = read_excel_cached(bnetza_pv_path,
+                                  skiprows=10,
+                                  dtype=read_schema('bnetza_pv', converters)[0],
+                                  converters=converters)
+
+    # Combine all PV BNetzA sheets into one DataFrame
+    print('Concatenating bnetza_pv')
+    bnetza_pv_df = pd.concat(bnetza_pv.values())
+
+    # Drop not needed NULL "Unnamed:" column
+    frames['BNetzA_PV'] = bnetza_pv_df.drop(bnetza_pv_df.columns[[7]], axis=1)
+
+    return frames
+
+
+def read_DE(netztransparenz_path, bnetza_path, bnetza_pv_path):
+    """This function reads the registers of the TSOs and the BNetzA and 
+    returns them as OrderedDict of DataFrames by data source."""
+    frames = OrderedDict()
+
+    # Read TSO data from zip file, one process per TSO
+    with tempfile.TemporaryDirectory() as arrow_dir:
+        with process_pool(len(tso_names)) as executor:
+            arrow_paths = list(executor.map(read_tso_csv,
+                                            [netztransparenz_path] * len(tso_names),
+                                            tso_names,
+                                            [arrow_dir] * len(tso_names)))
+        for tso, arrow_path in zip(tso_names, arrow_paths):
+            frames[tso] = read_arrow(arrow_path)
+
+    frames.update(read_bnetza(bnetza_path, bnetza_pv_path))
+    return frames
 
 
 # ### 3.1.2 Translate column names
 # To standardise the DataFrame the original column names from the German TSOs and the BNetzA wil be translated and new english column names wil be assigned to the DataFrame. The unique column names are required to merge the DataFrame.<br>
-# The column_translation_list is provided here as csv in the input folder. It is loaded in _2.3 Setup of translation dictionaries_.
+# The column_translation_list is provided here as csv in the input folder. It is loaded in _2.4 Setup of translation dictionaries_.
 
 # In[52]:
 
@@ -315,80 +1391,133 @@ column_dict_DE = columnnames.loc[idx_DE].set_index('original_name')['opsd_name']
 column_dict_DE
 
 
-# In[53]:
-
-print('Translation')
-amprion_df.rename(columns=column_dict_DE, inplace=True)
-hertz_df.rename(columns=column_dict_DE, inplace=True)
-tennet_df.rename(columns=column_dict_DE, inplace=True)
-transnetbw_df.rename(columns=column_dict_DE, inplace=True)
-bnetza_df.rename(columns=column_dict_DE, inplace=True)
-bnetza_pv_df.rename(columns=column_dict_DE, inplace=True)
-
-
 # ### 3.1.3 Add information and choose columns
-# All data source names and (for the BNetzA-PV data) the energy source will is added.
+# All data source names and (for the BNetzA-PV data) the energy source will is added. Of the BNetzA register, just some of all the columns are utilized further.
 
 # In[54]:
 
-# Add data source names to the DataFrames
-transnetbw_df['data_source'] = 'TransnetBW'
-tennet_df['data_source'] = 'TenneT'
-amprion_df['data_source'] = 'Amprion'
-hertz_df['data_source'] = '50Hertz'
-bnetza_df['data_source'] = 'BNetzA'
-bnetza_pv_df['data_source'] = 'BNetzA_PV'
-
-# Add for the BNetzA PV data the energy source
-bnetza_pv_df['energy_source'] = 'Photovoltaics'
-
 # Correct datetime-format
 def decom_fkt(x):
-    x = str(x)
-    if x == 'nan':
+    # Missing values are NaN or, read from the Parquet cache, None
+    if pd.isnull(x):
         x = ''
     else:
-        x = x[0:10]
+        x = str(x)[0:10]
     return x
 
-bnetza_df['decommissioning_date'] = bnetza_df['decommissioning_date'].apply(
-    decom_fkt)
-
-
-# In[55]:
-
-# Just some of all the columns of this DataFrame are utilized further
-bnetza_df = bnetza_df.loc[:,('commissioning_date','decommissioning_date','notification_reason',
-                             'energy_source',
-                             'electrical_capacity_kW','thermal_capacity_kW',
-                             'voltage_level','dso','eeg_id','bnetza_id',
-                             'federal_state','postcode','municipality_code','municipality',
-                             'address','address_number',
-                             'utm_zone','utm_east','utm_north',
-                             'data_source')]
-
 
 # ### 3.1.4 Merge DataFrames
 # The individual DataFrames from the TSOs (Netztransparenz.de) and BNetzA are merged.
 
 # In[56]:
 
-dataframes = [transnetbw_df, tennet_df, amprion_df, hertz_df, bnetza_pv_df, bnetza_df]
-DE_renewables = pd.concat(dataframes)
-# Make sure the decommissioning_column has the right dtype
-DE_renewables['decommissioning_date'] = pd.to_datetime(DE_renewables['decommissioning_date'])
-DE_renewables.reset_index(drop=True, inplace=True)
-
-
-# **First look at DataFrame structure and format**
-
-# In[57]:
-
-DE_renewables.info()
+# Order of the German data sources in the merged DataFrame
+DE_sources = ['TransnetBW', 'TenneT', 'Amprion', '50Hertz', 'BNetzA_PV', 'BNetzA']
+
+
+def prepare_DE(df, data_source, column_dict):
+    """This function translates the column names of a German register and
+    adds its data source. The BNetzA PV register gets its energy source, of
+    the BNetzA register just some of all the columns are kept."""
+    df = df.rename(columns=column_dict).assign(data_source=data_source)
+
+    if data_source == 'BNetzA_PV':
+        # Add for the BNetzA PV data the energy source
+        df['energy_source'] = 'Photovoltaics'
+
+    elif data_source == 'BNetzA':
+        df['decommissioning_date'] = df['decommissioning_date'].apply(decom_fkt)
+
+        # Just some of all the columns of this DataFrame are utilized further
+        df = df.loc[:,('commissioning_date','decommissioning_date','notification_reason',
+                       'energy_source',
+                       'electrical_capacity_kW','thermal_capacity_kW',
+                       'voltage_level','dso','eeg_id','bnetza_id',
+                       'federal_state','postcode','municipality_code','municipality',
+                       'address','address_number',
+                       'utm_zone','utm_east','utm_north',
+                       'data_source')]
+    return df
+
+
+def merge_DE(frames, column_dict):
+    """This function translates the column names of the German registers,
+    adds the data source and merges them into one DataFrame."""
+    print('Translation')
+    dataframes = [prepare_DE(frames[data_source], data_source, column_dict)
+                  for data_source in DE_sources]
+    DE_renewables = concat_frames(dataframes)
+    # Make sure the decommissioning_column has the right dtype
+    DE_renewables['decommissioning_date'] = pd.to_datetime(DE_renewables['decommissioning_date'])
+    DE_renewables.reset_index(drop=True, inplace=True)
+    return DE_renewables
+
+
+# **Incremental processing**
+# 
+# Between two publications of the registers only a small part of the entries changes. If the option _incremental_ is set, only new and changed entries are processed in the following steps, the processed entries of all other entries are taken from the last run (see _2.13 Processed data as Parquet dataset_). An entry is identified by its data source and EEG or BNetzA id, entries without id by their original values. It counts as changed if any of its original values changed. The identifiers and original values of the last run are stored in DE_renewables_snapshot.pickle. Delete this file to process all entries again, e.g. after changing the processing steps.
+
+# In[ ]:
+
+def snapshot_keys(df):
+    """This function returns a DataFrame with a key and a hash of the 
+    original values for each row of df."""
+    row_hash = pd.Series(pd.util.hash_pandas_object(df, index=False).values,
+                         index=df.index)
+    ids = df['eeg_id'].astype(object).where(df['eeg_id'].notnull(),
+                                            df['bnetza_id'].astype(object))
+    key = (df['data_source'].astype(str) + '|' 
+           + ids.astype(str).where(ids.notnull(), row_hash.astype(str)))
+    # Entries with the same key are distinguished by their running number
+    key = key + '|' + key.groupby(key).cumcount().astype(str)
+    return pd.DataFrame({'key': key.values, 'row_hash': row_hash.values},
+                        index=df.index)
+
+
+# In[ ]:
+
+def select_changed_DE(DE_renewables):
+    """This function returns the new and changed entries, the snapshot of 
+    all entries and the processed unchanged entries of the last run. 
+    Unless incremental is set, all entries are returned as changed."""
+    DE_snapshot = snapshot_keys(DE_renewables)
+    DE_unchanged = None
+
+    if incremental and os.path.exists('DE_renewables_snapshot.pickle'):
+        previous_snapshot = pd.read_pickle('DE_renewables_snapshot.pickle')
+        previous_snapshot['position'] = np.arange(len(previous_snapshot))
+        matched = DE_snapshot.merge(previous_snapshot, on=['key', 'row_hash'],
+                                    how='left')
+        unchanged = matched['position'].notnull().values
+
+        # Processed entries of the last run, indexed like the current entries. 
+        # The dataset is partitioned by energy source, thus the entries are 
+        # sorted by their index, which is their position in the snapshot
+        DE_unchanged = read_processed('DE').sort_index().iloc[
+            matched.loc[unchanged, 'position'].astype(int).values]
+        DE_unchanged.index = DE_renewables.index[unchanged]
+
+        DE_renewables = DE_renewables[~unchanged]
+        removed = ~previous_snapshot['key'].isin(DE_snapshot['key'])
+        print('Unchanged entries:', unchanged.sum(),
+              '- new or changed entries:', len(DE_renewables),
+              '- removed entries:', removed.sum())
+    return DE_renewables, DE_snapshot, DE_unchanged
+
+
+def patch_unchanged_DE(DE_renewables, DE_unchanged):
+    """This function patches the processed new and changed entries into
+    the processed unchanged entries of the last run, if there are any. The
+    columns are ordered as in a run without incremental, not as read from
+    the dataset, which puts the partition column energy_source last."""
+    if DE_unchanged is None:
+        return DE_renewables
+    return pd.concat([DE_unchanged, DE_renewables]).sort_index().reindex(
+        columns=DE_renewables.columns)
 
 
 # ### 3.1.5 Translate values and harmonize energy source
-# Different German terms for energy source, energy source subtypes and voltage levels are translated and harmonized across the individual data sources. The value_translation_list is provided here as csv in the input folder. It is loaded in _2.3 Setup of translation dictionaries_.
+# Different German terms for energy source, energy source subtypes and voltage levels are translated and harmonized across the individual data sources. The value_translation_list is provided here as csv in the input folder. It is loaded in _2.4 Setup of translation dictionaries_.
 
 # In[58]:
 
@@ -398,59 +1527,44 @@ value_dict_DE = valuenames.loc[idx_DE].set_index('original_name')['opsd_name'].t
 value_dict_DE
 
 
-# In[59]:
-
-print('replacing..')
-# Running time: some minutes. %time prints the time your computer required for this step
-get_ipython().magic('time DE_renewables.replace(value_dict_DE, inplace=True)')
-
-
-# **Separate and assign energy source and subtypes**
-
 # In[60]:
 
 # Create dctionnary in order to assign energy_source to its subtype
 energy_source_dict_DE = valuenames.loc[idx_DE].set_index('opsd_name')['energy_source'].to_dict()
-
-# Column energy_source partly contains subtype information, thus this column is copied
-# to new column for energy_source_subtype...
-DE_renewables['energy_source_subtype'] = DE_renewables['energy_source']
-
-# ...and the energy source subtype values in the energy_source column are replaced by 
-# the higher level classification
-DE_renewables['energy_source'].replace(energy_source_dict_DE, inplace=True)
-
-
-# In[61]:
-
-# Overview of dictionary
 energy_source_dict_DE
 
 
-# **Summary of DataFrame**
-
-# In[62]:
-
-# Electrical capacity per energy_source (in MW)
-DE_renewables.groupby(['energy_source'])['electrical_capacity_kW'].sum() / 1000
+# ### 3.1.6 Transform electrical_capacity from kW to MW
 
+# In[64]:
 
-# In[63]:
+# Names of the capacity columns in MW
+capacity_columns_DE = {'electrical_capacity_kW': 'electrical_capacity',
+                       'thermal_capacity_kW': 'thermal_capacity'}
 
-# Electrical capacity per energy_source_subtype (in MW)
-DE_renewables.groupby(['energy_source_subtype'])['electrical_capacity_kW'].sum() / 1000
 
+def translate_DE(DE_renewables, value_dict, energy_source_dict):
+    """This function translates the values of the German DataFrame, 
+    separates energy source and subtype and converts capacities to MW."""
+    DE_renewables = DE_renewables.copy()
+    print('replacing..')
+    translate_values(DE_renewables, value_dict)
 
-# ### 3.1.6 Transform electrical_capacity from kW to MW
+    # Column energy_source partly contains subtype information, thus this column is copied
+    # to new column for energy_source_subtype...
+    DE_renewables['energy_source_subtype'] = DE_renewables['energy_source']
 
-# In[64]:
+    # ...and the energy source subtype values in the energy_source column are replaced by 
+    # the higher level classification
+    DE_renewables['energy_source'] = translate_series(DE_renewables['energy_source'],
+                                                      energy_source_dict)
 
-# kW to MW
-DE_renewables[['electrical_capacity_kW','thermal_capacity_kW']] /= 1000
+    # kW to MW
+    DE_renewables[['electrical_capacity_kW','thermal_capacity_kW']] /= 1000
 
-# adapt column name
-DE_renewables.rename(columns={'electrical_capacity_kW' : 'electrical_capacity',
-                              'thermal_capacity_kW' : 'thermal_capacity'},inplace=True)
+    # adapt column name
+    DE_renewables.rename(columns=capacity_columns_DE, inplace=True)
+    return DE_renewables
 
 
 # ### 3.1.7 Georeferencing
@@ -470,30 +1584,6 @@ DE_renewables.rename(columns={'electrical_capacity_kW' : 'electrical_capacity',
 # 
 # *(License: http://www.suche-postleitzahl.org/downloads, Open Database Licence for free use. Source of data: © OpenStreetMap contributors)*
 
-# In[65]:
-
-# Read generated postcode/location file
-postcode = pd.read_csv('input/de_tso_postcode_gps.csv',
-                       sep=';',
-                       header=0)
-
-# Drop possible duplicates in postcodes
-postcode.drop_duplicates('postcode', keep='last',inplace=True)
-
-# Show first entries
-postcode.head()
-
-
-# ** Merge geometry information by using the postcode**
-
-# In[66]:
-
-# Take postcode and longitude/latitude informations
-postcode = postcode[[0,3,4]]
-
-DE_renewables = DE_renewables.merge(postcode, on=['postcode'],  how='left')
-
-
 # #### Transform geoinformation
 # *(for data with already existing geoinformation)*
 # 
@@ -507,94 +1597,203 @@ DE_renewables = DE_renewables.merge(postcode, on=['postcode'],  how='left')
 # |32|	413151.72|	6027467.73| proper coordinates|
 # |32|	**32**912159.6008|	5692423.9664| caused error by 32|
 # 
+# 
+# **Choose coordinates by priority**
+# 
+# The converted UTM coordinates of the power plant are used if available, otherwise the centroid of the postcode area.
 
-# **How many different utm_zone values are in the data set?**
-
-# In[67]:
-
-DE_renewables.groupby(['utm_zone'])['utm_zone'].count()
-
-
-# **Remove the utm_zone "32" from the utm_east value**
-
-# In[68]:
-
-# Find entries with 32 value at the beginning
-ix_32 = (DE_renewables['utm_east'].astype(str).str[:2] == '32')
-ix_notnull = DE_renewables['utm_east'].notnull()
-
-# Remove 32 from utm_east entries
-DE_renewables.loc[ix_32,'utm_east'] = DE_renewables.loc[ix_32,'utm_east'].astype(str).str[2:].astype(float)
-
-
-# **Conversion UTM to lat/lon**
-
-# In[69]:
-
-# Convert from UTM values to latitude and longitude coordinates
-try:
-    DE_renewables['lonlat'] = DE_renewables.loc[ix_notnull, ['utm_east', 'utm_north', 'utm_zone']].apply(
-        lambda x: utm.to_latlon(x[0], x[1], x[2], 'U'),
-        axis=1) \
-        .astype(str)
-    
-except:
-    DE_renewables['lonlat'] = np.NaN
-    
-lat = []
-lon = []
-
-for row in DE_renewables['lonlat']:
-    try:
-        # Split tuple format into the column lat and lon  
-        row = row.lstrip('(').rstrip(')')
-        lat.append(row.split(',')[0])
-        lon.append(row.split(',')[1])
-    except:
-        # set NaN 
-        lat.append(np.NaN)
-        lon.append(np.NaN)
-          
-
-DE_renewables['latitude'] = pd.to_numeric(lat)
-DE_renewables['longitude'] = pd.to_numeric(lon) 
-
-# Add new values to DataFrame lon and lat
-DE_renewables['lat'] = DE_renewables[['lat', 'latitude']].apply(
-    lambda x: x[1] if pd.isnull(x[0]) else x[0],
-    axis=1)
-
-DE_renewables['lon'] = DE_renewables[['lon', 'longitude']].apply(
-    lambda x: x[1] if pd.isnull(x[0]) else x[0],
-    axis=1)
-
+# In[65]:
 
-# **Check: missing coordinates by data source and type**
+def geocode_DE(DE_renewables, index_path):
+    """This function adds the coordinates of the German power plants,
+    converted from UTM or assigned by postcode."""
+    DE_renewables = DE_renewables.copy()
 
-# In[70]:
+    # Get coordinates of the postcode areas from the geocoding index
+    postcode_lat, postcode_lon = geocode(index_path, 'DE', 'postcode',
+                                         DE_renewables['postcode'])
 
-print('Missing Coordinates ', DE_renewables.lat.isnull().sum())
+    # Find entries with 32 value at the beginning
+    ix_32 = (DE_renewables['utm_east'].astype(str).str[:2] == '32')
 
-DE_renewables[DE_renewables.lat.isnull()].groupby(['energy_source',
-                                             'data_source']
-                                            )['data_source'].count()
+    # Remove 32 from utm_east entries
+    DE_renewables.loc[ix_32,'utm_east'] = DE_renewables.loc[ix_32,'utm_east'].astype(str).str[2:].astype(float)
 
+    # Convert from UTM values to latitude and longitude coordinates
+    lat, lon, errors = utm_to_latlon(DE_renewables['utm_east'],
+                                     DE_renewables['utm_north'],
+                                     DE_renewables['utm_zone'])
+    report_conversion_errors(errors, DE_renewables.index)
 
-# **Remove temporary columns**
+    resolve_coordinates(DE_renewables, [('utm', lat, lon),
+                                        ('postcode', postcode_lat, postcode_lon)])
+    return DE_renewables
 
-# In[71]:
 
-# drop lonlat column that contains both, latitute and longitude
-DE_renewables.drop(['lonlat','longitude','latitude'], axis=1, inplace=True)
+# **Streaming mode**
+# 
+# If processing_mode is set to 'stream' in _2.1 Choose download option_, the registers of the TSOs are not merged before they are processed. Each register is read in chunks of csv_chunksize rows and each chunk is merged, translated and georeferenced on its own, so the memory needed by the processes of the TSOs is bounded by the chunk size instead of the size of the register. The processed chunks are stored as Arrow files and concatenated with the processed BNetzA registers in the order of _3.1.4 Merge DataFrames_.
+# 
+# The result is the same as processing the merged registers: All steps work row by row, the types of the columns are resolved for the whole register (see _3.1.1 Download and read_) and the categoricals, whose categories differ between the chunks, are stored as text and converted back by finalize_DE in _3.1.8 Save_. The option incremental is not supported in this mode, all entries are processed.
+
+# In[ ]:
+
+# Columns used by translate_DE and geocode_DE, added as empty columns to 
+# the parts of the registers which do not contain them
+processing_columns_DE = ['electrical_capacity_kW', 'thermal_capacity_kW',
+                         'utm_zone', 'utm_east', 'utm_north']
+
+
+def process_DE_part(df, value_dict, energy_source_dict, index_path):
+    """This function translates and georeferences a part of the German 
+    registers, prepared by prepare_DE, on its own. Categoricals are 
+    returned as text."""
+    if memory_budget:
+        df = compact_frame(df)
+    if 'decommissioning_date' in df:
+        df['decommissioning_date'] = pd.to_datetime(df['decommissioning_date'])
+
+    added = [column for column in processing_columns_DE if column not in df]
+    df = df.reindex(columns=df.columns.append(pd.Index(added)))
+    df = geocode_DE(translate_DE(df, value_dict, energy_source_dict), index_path)
+    # The empty columns are added by the concatenation, as in merge_DE
+    df = df.drop(columns=[capacity_columns_DE.get(column, column) 
+                          for column in added])
+
+    # The categories differ between the parts, thus they are stored as text
+    for column in df.columns[df.dtypes == 'category']:
+        df[column] = df[column].astype(object)
+    return df
+
+
+def stream_tso_csv(zip_path, tso, arrow_dir, column_dict, value_dict,
+                   energy_source_dict, index_path):
+    """This function processes the register of one TSO chunk by chunk and 
+    stores each processed chunk as Arrow file in arrow_dir. It returns the
+    column names of the prepared register and the paths of the chunks."""
+    print('Streaming', tso_filename(tso))
+    dtype = resolve_tso_dtypes(zip_path, tso)
+    columns = None
+    arrow_paths = []
+    for number, chunk in enumerate(read_tso_frames(zip_path, tso, dtype,
+                                                   csv_chunksize)):
+        chunk = prepare_DE(chunk, tso, column_dict)
+        columns = list(chunk.columns)
+        chunk = process_DE_part(chunk, value_dict, energy_source_dict, index_path)
+
+        arrow_path = os.path.join(arrow_dir, '{0}-{1:05d}.arrow'.format(tso, number))
+        table = dataframe_to_arrow(chunk)
+        with pa.OSFile(arrow_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        arrow_paths.append(arrow_path)
+    return columns, arrow_paths
+
+
+def stream_DE(netztransparenz_path, bnetza_path, bnetza_pv_path, column_dict,
+              value_dict, energy_source_dict, index_path):
+    """This function processes the registers of the TSOs chunk by chunk, one
+    process per TSO, and the registers of the BNetzA at once. It returns the
+    processed German DataFrame."""
+    columns = OrderedDict()
+    parts = OrderedDict()
+
+    with tempfile.TemporaryDirectory() as arrow_dir:
+        with process_pool(len(tso_names)) as executor:
+            results = list(executor.map(stream_tso_csv,
+                                        [netztransparenz_path] * len(tso_names),
+                                        tso_names,
+                                        [arrow_dir] * len(tso_names),
+                                        [column_dict] * len(tso_names),
+                                        [value_dict] * len(tso_names),
+                                        [energy_source_dict] * len(tso_names),
+                                        [index_path] * len(tso_names)))
+        for tso, (tso_columns, arrow_paths) in zip(tso_names, results):
+            columns[tso] = tso_columns
+            parts[tso] = [read_arrow(arrow_path) for arrow_path in arrow_paths]
+
+    for data_source, df in read_bnetza(bnetza_path, bnetza_pv_path).items():
+        df = prepare_DE(df, data_source, column_dict)
+        columns[data_source] = list(df.columns)
+        parts[data_source] = [process_DE_part(df, value_dict, energy_source_dict,
+                                              index_path)]
+
+    DE_renewables = pd.concat([part for data_source in DE_sources 
+                               for part in parts[data_source]],
+                              ignore_index=True)
+
+    # The columns are ordered as in merge_DE, followed by the columns added
+    # by translate_DE and geocode_DE
+    merged = pd.Index([])
+    for data_source in DE_sources:
+        merged = merged.append(pd.Index(columns[data_source]).difference(
+            merged, sort=False))
+    merged = merged.map(lambda column: capacity_columns_DE.get(column, column))
+    return DE_renewables[merged.append(
+        DE_renewables.columns.difference(merged, sort=False))]
 
 
 # ### 3.1.8 Save
 #  
-# The merged, translated, cleaned, DataFrame will be saved temporily as a pickle file, which stores a Python object fast.
+# The merged, translated, cleaned, DataFrame will be saved in the Parquet dataset of the processed data, see _2.13 Processed data as Parquet dataset_. Before, its text columns are converted to categoricals with sorted categories by finalize_DE, independent of the processing mode.
 
 # In[72]:
 
-DE_renewables.to_pickle('DE_renewables.pickle')
+def finalize_DE(DE_renewables):
+    """This function converts the text columns of the German DataFrame to 
+    categoricals with sorted categories and columns of mixed types to 
+    object columns, so the result does not depend on the processing mode.
+    In memory budget mode, the DataFrame is compacted."""
+    DE_renewables = DE_renewables.copy(deep=False)
+    for column, series in DE_renewables.items():
+        if series.dtype.name == 'category':
+            series = series.astype(object)
+        elif series.dtype != object:
+            continue
+        if is_text(series):
+            series = series.astype('category')
+        DE_renewables[column] = series
+    if memory_budget:
+        DE_renewables = compact_frame(DE_renewables)
+    return DE_renewables
+
+
+def process_DE():
+    """This function runs all stages of the German data, saves and returns
+    the resulting DataFrame."""
+    if processing_mode == 'stream':
+        if incremental:
+            logger.warning('incremental is not supported in stream mode, '
+                           'all entries are processed')
+        DE_renewables = run_stage('DE_stream', stream_DE, 
+                                  filepaths['netztransparenz'],
+                                  filepaths['bnetza'], filepaths['bnetza_pv'],
+                                  column_dict_DE, value_dict_DE,
+                                  energy_source_dict_DE,
+                                  geocoding_index_path('DE'))
+        DE_renewables = finalize_DE(DE_renewables)
+        save_processed(DE_renewables, 'DE')
+
+        # The snapshot of an earlier run does not match the saved entries
+        if os.path.exists('DE_renewables_snapshot.pickle'):
+            os.remove('DE_renewables_snapshot.pickle')
+        return DE_renewables
+
+    DE_frames = run_stage('DE_read', read_DE, filepaths['netztransparenz'],
+                          filepaths['bnetza'], filepaths['bnetza_pv'])
+    DE_renewables = run_stage('DE_merge', merge_DE, DE_frames, column_dict_DE)
+    DE_renewables, DE_snapshot, DE_unchanged = select_changed_DE(DE_renewables)
+    DE_renewables = run_stage('DE_translate', translate_DE, DE_renewables,
+                              value_dict_DE, energy_source_dict_DE)
+    DE_renewables = run_stage('DE_geocode', geocode_DE, DE_renewables,
+                              geocoding_index_path('DE'))
+
+    # Patch the processed entries into the unchanged entries of the last run
+    DE_renewables = patch_unchanged_DE(DE_renewables, DE_unchanged)
+    DE_renewables = finalize_DE(DE_renewables)
+    save_processed(DE_renewables, 'DE')
+    DE_snapshot.to_pickle('DE_renewables_snapshot.pickle')
+    return DE_renewables
 
 
 # ## 3.2 Denmark DK
@@ -606,51 +1805,32 @@ DE_renewables.to_pickle('DE_renewables.pickle')
 # 
 # ** [Energinet.dk](http://www.energinet.dk/DA/El/Engrosmarked/Udtraek-af-markedsdata/Sider/Statistik.aspx)** - The data of solar power plants are released by the leading transmission network operator Denmark.
 
-# In[73]:
-
-# point URLs to original data depending on the chosen download option
-if download_from == 'original_sources':
-    
-    url_DK_ens = 'https://ens.dk/sites/ens.dk/files/Statistik/anlaegprodtilnettet_0.xls'
-    url_DK_energinet = 'http://www.energinet.dk/SiteCollectionDocuments/Danske%20dokumenter/El/SolcelleGraf.xlsx'
-    url_DK_geo = 'http://download.geonames.org/export/zip/DK.zip'
-
-elif download_from == 'opsd_server':
-    
-    url_DK_ens = (url_opsd + version + folder + '/DK/anlaegprodtilnettet.xls')
-    url_DK_energinet = (url_opsd + version + folder + '/DK/SolcelleGraf.xlsx')
-    url_DK_geo = (url_opsd + version + folder + 'DK/DK.zip')
-
-
 # In[74]:
 
-# Get wind turbines data 
-DK_wind_df = pd.read_excel(download_and_cache(url_DK_ens),
-                           sheetname='IkkeAfmeldte-Existing turbines',
-                           thousands='.', 
-                           header=17,
-                           skipfooter=3,
-                           parse_cols=16,
-                           converters={'Møllenummer (GSRN)': str,
-                                       'Kommune-nr': str,
-                                       'Postnr': str}
-                          )
-                         
-# Get photovoltaic data
-DK_solar_df = pd.read_excel(download_and_cache(url_DK_energinet),
-                            sheetname='Data',
-                            converters={'Postnr': str}
-                           )
-
-
-# In[75]:
-
-DK_wind_df.head(2)
-
-
-# In[76]:
-
-DK_solar_df.head(2)
+def read_DK(ens_path, energinet_path):
+    """This function reads the Danish wind and solar data and returns 
+    both DataFrames."""
+    converters_DK_ens = {'Møllenummer (GSRN)': str, 'Kommune-nr': str, 'Postnr': str}
+    converters_DK_energinet = {'Postnr': str}
+
+    # Get wind turbines data 
+    DK_wind_df = read_excel_cached(ens_path,
+                                   ['IkkeAfmeldte-Existing turbines'],
+                                   thousands='.', 
+                                   header=17,
+                                   skipfooter=3,
+                                   parse_cols=16,
+                                   dtype=read_schema('DK_ens', converters_DK_ens)[0],
+                                   converters=converters_DK_ens
+                                  )['IkkeAfmeldte-Existing turbines']
+                             
+    # Get photovoltaic data
+    DK_solar_df = read_excel_cached(energinet_path,
+                                    ['Data'],
+                                    dtype=read_schema('DK_energinet', converters_DK_energinet)[0],
+                                    converters=converters_DK_energinet
+                                   )['Data']
+    return DK_wind_df, DK_solar_df
 
 
 # ### 3.2.2 Translate column names
@@ -663,27 +1843,8 @@ column_dict_DK = columnnames.loc[idx_DK].set_index('original_name')['opsd_name']
 column_dict_DK
 
 
-# In[78]:
-
-# Translate columns by list 
-DK_wind_df.rename(columns = column_dict_DK, inplace=True)
-DK_solar_df.rename(columns = column_dict_DK, inplace=True)
-
-
 # ### 3.2.3 Add data source and missing information
 
-# In[79]:
-
-# Add names of the data sources to the DataFrames
-DK_wind_df['data_source'] = 'Energistyrelsen'
-DK_solar_df['data_source'] = 'Energinet.dk'
-
-# Add energy_source for each of the two DataFrames
-DK_wind_df['energy_source'] = 'Wind'
-DK_solar_df['energy_source'] = 'Solar'
-DK_solar_df['energy_source_subtype'] = 'Photovoltaics'
-
-
 # ### 3.2.4 Translate values and harmonize energy source
 
 # In[80]:
@@ -695,7 +1856,24 @@ value_dict_DK
 
 # In[81]:
 
-DK_wind_df.replace(value_dict_DK, inplace=True)
+def translate_DK(DK_wind_df, DK_solar_df, column_dict, value_dict):
+    """This function translates the column names and values of the Danish
+    DataFrames and adds data source and energy source."""
+    # Translate columns by list 
+    DK_wind_df = DK_wind_df.rename(columns = column_dict)
+    DK_solar_df = DK_solar_df.rename(columns = column_dict)
+
+    # Add names of the data sources to the DataFrames
+    DK_wind_df['data_source'] = 'Energistyrelsen'
+    DK_solar_df['data_source'] = 'Energinet.dk'
+
+    # Add energy_source for each of the two DataFrames
+    DK_wind_df['energy_source'] = 'Wind'
+    DK_solar_df['energy_source'] = 'Solar'
+    DK_solar_df['energy_source_subtype'] = 'Photovoltaics'
+
+    translate_values(DK_wind_df, value_dict)
+    return DK_wind_df, DK_solar_df
 
 
 # ### 3.2.5 Georeferencing
@@ -704,45 +1882,6 @@ DK_wind_df.replace(value_dict_DK, inplace=True)
 # 
 # The Energistyrelsen data set offers UTM Geoinformation with the columns utm_east and utm_north belonging to the UTM zone 32. In this section the existing geoinformation (in UTM-format) will be transformed into latidude and longitude coordiates as a uniform standard for geoinformation.
 
-# In[82]:
-
-# Index for all values with utm information
-idx_notnull= DK_wind_df['utm_east'].notnull()
-
-
-# In[83]:
-
-# Convert from UTM values to latitude and longitude coordinates
-DK_wind_df['lonlat'] = DK_wind_df.loc[idx_notnull,['utm_east','utm_north']
-                                           ].apply(lambda x: utm.to_latlon(x[0],
-                                           x[1],32,'U'), axis=1).astype(str)
-
-
-# In[84]:
-
-# Split latitude and longitude in two columns
-lat = []
-lon = []
-
-for row in DK_wind_df['lonlat']:
-    try:
-        # Split tuple format
-        # into the column lat and lon  
-        row = row.lstrip('(').rstrip(')')
-        lat.append(row.split(',')[0])
-        lon.append(row.split(',')[1])
-    except:
-        # set NAN 
-        lat.append(np.NaN)
-        lon.append(np.NaN)
-        
-DK_wind_df['lat'] = pd.to_numeric(lat)
-DK_wind_df['lon'] = pd.to_numeric(lon)
-
-# drop lonlat column that contains both, latitute and longitude
-DK_wind_df.drop('lonlat', axis=1, inplace=True)
-
-
 # **Postcode to lat/lon (WGS84)**
 # *(for data from Energinet.dk)*
 # 
@@ -751,86 +1890,80 @@ DK_wind_df.drop('lonlat', axis=1, inplace=True)
 # 
 # ** [geonames.org](http://download.geonames.org/export/zip/?C=N;O=D)** The postcode  data from Denmark is provided by Geonames and licensed under a [Creative Commons Attribution 3.0 license](http://creativecommons.org/licenses/by/3.0/).
 
-# In[85]:
-
-# Get geo-information
-zip_DK_geo = zipfile.ZipFile(download_and_cache(url_DK_geo))
-
-# Read generated postcode/location file
-DK_geo = pd.read_csv(zip_DK_geo.open('DK.txt'), sep='\t', header=-1)
-
-# add column names as defined in associated readme file
-DK_geo.columns =  ['country_code','postcode','place_name','admin_name1',
-                   'admin_code1','admin_name2','admin_code2','admin_name3',
-                   'admin_code3','lat','lon','accuracy']
-
-# Drop rows of possible duplicate postal_code
-DK_geo.drop_duplicates('postcode', keep='last',inplace=True)
-DK_geo['postcode'] = DK_geo['postcode'].astype(str)
-
-
-# In[86]:
-
-# Add longitude/latitude infomation assigned by postcode (for Energinet.dk data)
-DK_solar_df = DK_solar_df.merge(DK_geo[['postcode','lon','lat']], 
-                                on=['postcode'],
-                                how='left')
+# In[83]:
 
+def geocode_DK(DK_wind_df, DK_solar_df, index_path):
+    """This function adds the coordinates of the Danish wind turbines, 
+    converted from UTM, and of the solar plants, assigned by postcode."""
+    DK_wind_df = DK_wind_df.copy()
 
-# In[87]:
+    # Convert from UTM values to latitude and longitude coordinates
+    lat, lon, errors = utm_to_latlon(DK_wind_df['utm_east'],
+                                     DK_wind_df['utm_north'], 32)
+    report_conversion_errors(errors, DK_wind_df.index)
+    resolve_coordinates(DK_wind_df, [('utm', lat, lon)])
 
-print('Missing Coordinates DK_wind ',DK_wind_df.lat.isnull().sum())
-print('Missing Coordinates DK_solar ',DK_solar_df.lat.isnull().sum())
+    # Add longitude/latitude infomation assigned by postcode (for Energinet.dk data)
+    DK_solar_df = DK_solar_df.copy()
+    lat, lon = geocode(index_path, 'DK', 'postcode', DK_solar_df['postcode'])
+    resolve_coordinates(DK_solar_df, [('postcode', lat, lon)])
+    return DK_wind_df, DK_solar_df
 
 
 # ### 3.2.6 Merge DataFrames and choose columns
 
-# In[88]:
-
-dataframes = [DK_wind_df, DK_solar_df]
-DK_renewables = pd.concat(dataframes)
-DK_renewables = DK_renewables.reset_index()
-
-
 # In[89]:
 
 # Only these columns will be kept for the renewable power plant list output
 column_interest = ['commissioning_date', 'energy_source','energy_source_subtype',
                    'electrical_capacity_kW', 'dso','gsrn_id', 'postcode',
                    'municipality_code','municipality','address', 'address_number',
-                   'utm_east', 'utm_north', 'lon','lat','hub_height',
+                   'utm_east', 'utm_north', 'lon','lat','coordinate_source','hub_height',
                    'rotor_diameter', 'manufacturer', 'model', 'data_source']
 
 
-# In[90]:
-
-# Clean DataFrame from columns other than specified above
-DK_renewables = DK_renewables.loc[:, column_interest]
-DK_renewables.reset_index(drop=True, inplace=True)
-
-
 # ### 3.2.7 Transform electrical_capacity from kW to MW
 
 # In[91]:
 
-# kW to MW
-DK_renewables['electrical_capacity_kW'] /= 1000
+def merge_DK(DK_wind_df, DK_solar_df, columns):
+    """This function merges the Danish DataFrames, keeps the given 
+    columns and converts the capacity to MW."""
+    dataframes = [DK_wind_df, DK_solar_df]
+    DK_renewables = pd.concat(dataframes)
+    DK_renewables = DK_renewables.reset_index()
 
-# adapt column name
-DK_renewables.rename(columns={'electrical_capacity_kW': 'electrical_capacity'},
-                inplace=True)
+    # Clean DataFrame from columns other than specified above
+    DK_renewables = DK_renewables.loc[:, columns]
+    DK_renewables.reset_index(drop=True, inplace=True)
 
+    # kW to MW
+    DK_renewables['electrical_capacity_kW'] /= 1000
 
-# In[92]:
-
-DK_renewables.head(2)
+    # adapt column name
+    DK_renewables.rename(columns={'electrical_capacity_kW': 'electrical_capacity'},
+                    inplace=True)
+    return DK_renewables
 
 
 # ### 3.2.8 Save
 
 # In[93]:
 
-DK_renewables.to_pickle('DK_renewables.pickle')
+def process_DK():
+    """This function runs all stages of the Danish data, saves and returns
+    the resulting DataFrame."""
+    DK_wind_df, DK_solar_df = run_stage('DK_read', read_DK, filepaths['DK_ens'],
+                                        filepaths['DK_energinet'])
+    DK_wind_df, DK_solar_df = run_stage('DK_translate', translate_DK, DK_wind_df,
+                                        DK_solar_df, column_dict_DK, value_dict_DK)
+    DK_wind_df, DK_solar_df = run_stage('DK_geocode', geocode_DK, DK_wind_df,
+                                        DK_solar_df, geocoding_index_path('DK'))
+    DK_renewables = run_stage('DK_merge', merge_DK, DK_wind_df, DK_solar_df,
+                              column_interest)
+
+    save_processed(DK_renewables, 'DK')
+    return DK_renewables
 
 
 # ## 3.3 France FR
@@ -840,45 +1973,33 @@ DK_renewables.to_pickle('DK_renewables.pickle')
 # 
 # ** [Ministery of the Environment, Energy and the Sea](http://www.statistiques.developpement-durable.gouv.fr/energie-climat/r/energies-renouvelables.html?tx_ttnews%5Btt_news%5D=24638&cHash=d237bf9985fdca39d7d8c5dc84fb95f9)** - Number of installations and installed capacity of the different renewable source for every municipality in France. Service of observation and statistics, survey, date of last update: 15/12/2015. Data until 31/12/2014.
 
-# In[94]:
-
-# point URLs to original data depending on the chosen download option
-if download_from == 'original_sources':
-    
-    url_FR_gouv = "http://www.statistiques.developpement-durable.gouv.fr/fileadmin/documents/Themes/Energies_et_climat/Les_differentes_energies/Energies_renouvelables/donnees_locales/2014/electricite-renouvelable-par-commune-2014.xls"
-    url_FR_geo = 'http://public.opendatasoft.com/explore/dataset/code-postal-code-insee-2015/download/?format=csv&timezone=Europe/Berlin&use_labels_for_header=true'
-
-else:
-    url_FR_gouv = (url_opsd + version + folder + '/FR/electricite-renouvelable-par-commune-2014.xls')
-    url_FR_geo = (url_opsd + version + folder + 'FR/code-postal-code-insee-2015.csv')
-
-
-# In[95]:
-
-# Get data of renewables per municipality
-FR_re_df = pd.read_excel(download_and_cache(url_FR_gouv),
-                         sheetname='Commune', 
-                         encoding = 'UTF8',  
-                         thousands='.',
-                         decimals=',',
-                         header=[2, 3],
-                         skipfooter=9,  # contains summarized values
-                         index_col=[0, 1], # required for MultiIndex
-                         converters={'Code officiel géographique':str})
-
-
 # ### 3.3.2 Rearrange columns and translate column names
 
 # The French data source contains number of installations and sum of installed capacity per energy source per municipality. The structure is adapted to the power plant list of other countries. The list is limited to the plants which are covered by article 10 of february 2000 by an agreement to a purchase commitment.
 
-# In[96]:
+# In[95]:
 
-# Rearrange data 
-FR_re_df.index.rename(['insee_com', 'municipality'], inplace=True)
-FR_re_df.columns.rename(['energy_source', None], inplace=True)
-FR_re_df = (FR_re_df
-            .stack(level='energy_source', dropna=False)
-            .reset_index(drop = False))
+def read_FR(gouv_path):
+    """This function reads the French data per municipality and rearranges
+    it into one row per municipality and energy source."""
+    # Get data of renewables per municipality
+    FR_re_df = pd.read_excel(gouv_path,
+                             sheetname='Commune', 
+                             encoding = 'UTF8',  
+                             thousands='.',
+                             decimals=',',
+                             header=[2, 3],
+                             skipfooter=9,  # contains summarized values
+                             index_col=[0, 1], # required for MultiIndex
+                             converters={'Code officiel géographique':str})
+
+    # Rearrange data 
+    FR_re_df.index.rename(['insee_com', 'municipality'], inplace=True)
+    FR_re_df.columns.rename(['energy_source', None], inplace=True)
+    FR_re_df = (FR_re_df
+                .stack(level='energy_source', dropna=False)
+                .reset_index(drop = False))
+    return FR_re_df
 
 
 # In[97]:
@@ -889,31 +2010,8 @@ column_dict_FR = columnnames.loc[idx_FR].set_index('original_name')['opsd_name']
 column_dict_FR
 
 
-# In[98]:
-
-# Translate columnnames
-FR_re_df.rename(columns = column_dict_FR, inplace=True)
-
-
-# In[99]:
-
-# Drop all rows that just contain NA
-FR_re_df = FR_re_df.dropna()
-FR_re_df.head()
-
-
 # ### 3.3.3 Add data source
 
-# In[100]:
-
-FR_re_df['data_source'] = 'gouv.fr'
-
-
-# In[101]:
-
-FR_re_df.info()
-
-
 # ### 3.3.4 Translate values and harmonize energy source
 
 # ** Kept secret if number of installations < 3**
@@ -927,11 +2025,6 @@ value_dict_FR = valuenames.loc[idx_FR].set_index('original_name')['opsd_name'].t
 value_dict_FR
 
 
-# In[103]:
-
-FR_re_df.replace(value_dict_FR, inplace=True)
-
-
 # **Separate and assign energy source and subtypes**
 
 # In[104]:
@@ -939,18 +2032,33 @@ FR_re_df.replace(value_dict_FR, inplace=True)
 # Create dictionnary in order to assign energy_source to its subtype
 energy_source_dict_FR = valuenames.loc[idx_FR].set_index('opsd_name')['energy_source'].to_dict()
 
-# Column energy_source partly contains subtype information, thus this column is copied
-# to new column for energy_source_subtype...
-FR_re_df['energy_source_subtype'] = FR_re_df['energy_source']
 
-# ...and the energy source subtype values in the energy_source column are replaced by 
-# the higher level classification
-FR_re_df['energy_source'].replace(energy_source_dict_FR, inplace=True)
+# In[ ]:
+
+def translate_FR(FR_re_df, column_dict, value_dict, energy_source_dict):
+    """This function translates the column names and values of the French
+    DataFrame and separates energy source and subtype."""
+    # Translate columnnames
+    FR_re_df = FR_re_df.rename(columns = column_dict)
+
+    # Drop all rows that just contain NA
+    FR_re_df = FR_re_df.dropna()
+
+    FR_re_df['data_source'] = 'gouv.fr'
 
+    translate_values(FR_re_df, value_dict)
 
-# In[105]:
+    # Column energy_source partly contains subtype information, thus this column is copied
+    # to new column for energy_source_subtype...
+    FR_re_df['energy_source_subtype'] = FR_re_df['energy_source']
 
-FR_re_df.reset_index(drop=True, inplace=True)
+    # ...and the energy source subtype values in the energy_source column are replaced by 
+    # the higher level classification
+    FR_re_df['energy_source'] = translate_series(FR_re_df['energy_source'],
+                                                 energy_source_dict)
+
+    FR_re_df.reset_index(drop=True, inplace=True)
+    return FR_re_df
 
 
 # ### 3.3.5 Georeferencing
@@ -960,79 +2068,33 @@ FR_re_df.reset_index(drop=True, inplace=True)
 # 
 # ** [OpenDataSoft](http://public.opendatasoft.com/explore/dataset/code-postal-code-insee-2015/information/)** publishes a list of French INSEE codes and corresponding coordinates is published under the [Licence Ouverte (Etalab)](https://www.etalab.gouv.fr/licence-ouverte-open-licence).
 
-# In[106]:
-
-# Downlad French geo-information. As download_and_cache_function is not working
-# properly yet, thus other way of downloading
-filename = 'code-postal-insee-2015.csv'
-filepath = "input/original_data/" + filename
-if not os.path.exists(filepath):
-        print("Downloading file: ", filename)
-        FR_geo_csv = urllib.request.urlretrieve(url_FR_geo, filepath)
-else:
-        print("Using local file from", filepath)
-
-
 # In[107]:
 
-# Read INSEE Code Data
-FR_geo = pd.read_csv('input/original_data/code-postal-insee-2015.csv',
-                     sep=';',
-                     header=0,
-                     converters={'Code_postal':str})
-
-# Drop possible duplicates of the same INSEE code
-FR_geo.drop_duplicates('INSEE_COM', keep='last',inplace=True)
-
-
-# In[108]:
-
-# create columns for latitude/longitude
-lat = []
-lon = []
-
-# split in latitude/longitude
-for row in FR_geo['Geo Point']:
-    try:
-        # Split tuple format
-        # into the column lat and lon  
-        row = row.lstrip('(').rstrip(')')
-        lat.append(row.split(',')[0])
-        lon.append(row.split(',')[1])
-    except:
-        # set NAN 
-        lat.append(np.NaN)
-        lon.append(np.NaN)
-        
-# add these columns to the INSEE DataFrame
-FR_geo['lat'] = pd.to_numeric(lat)
-FR_geo['lon'] = pd.to_numeric(lon)
-
-
-# In[109]:
-
-# Column names of merge key have to be named identically
-FR_re_df.rename(columns={'municipality_code': 'INSEE_COM'}, inplace=True)
-
-# Merge longitude and latitude columns by the Code INSEE
-FR_re_df = FR_re_df.merge(FR_geo[['INSEE_COM','lat','lon']],
-                          on=['INSEE_COM'],
-                          how='left')
-
-# Translate Code INSEE column back to municipality_code
-FR_re_df.rename(columns={'INSEE_COM': 'municipality_code'}, inplace=True)
-
-
-# In[110]:
-
-FR_re_df.head(2)
+def geocode_FR(FR_re_df, index_path):
+    """This function adds the coordinates of the French municipalities by 
+    their INSEE code."""
+    FR_re_df = FR_re_df.copy()
+    lat, lon = geocode(index_path, 'FR', 'municipality',
+                       FR_re_df['municipality_code'])
+    resolve_coordinates(FR_re_df, [('municipality', lat, lon)])
+    return FR_re_df
 
 
 # ### 3.3.6 Save
 
 # In[111]:
 
-FR_re_df.to_pickle('FR_renewables.pickle')
+def process_FR():
+    """This function runs all stages of the French data, saves and returns
+    the resulting DataFrame."""
+    FR_re_df = run_stage('FR_read', read_FR, filepaths['FR_gouv'])
+    FR_re_df = run_stage('FR_translate', translate_FR, FR_re_df, column_dict_FR,
+                         value_dict_FR, energy_source_dict_FR)
+    FR_re_df = run_stage('FR_geocode', geocode_FR, FR_re_df, 
+                         geocoding_index_path('FR'))
+
+    save_processed(FR_re_df, 'FR')
+    return FR_re_df
 
 
 # ## 3.4 Poland PL
@@ -1051,25 +2113,11 @@ FR_re_df.to_pickle('FR_renewables.pickle')
 # - 'Generate', then the rtf-file simple.rtf will be downloaded
 # - Put it in the folder input/original_data on your computer
 
-# In[114]:
-
-if download_from == 'opsd_server':
-    url_PL_ure = (url_opsd + version + folder + '/PL/simple.rtf')
-    download_and_cache(url_PL_ure)
-
-
-# In[115]:
-
-# read rtf-file to string with the correct encoding
-with open('input/original_data/simple.rtf', 'r') as rtf:
-    file_content = rtf.read()
-
-file_content = file_content.encode('utf-8').decode('iso-8859-2')
-
-
 # ### 3.4.2 Rearrange data from rft-file
 
-# The rtf file has one table for each district in the rtf-file which needs to be separated from each and other and restructured to get all plants in one DataFrame with the information: district, energy_source, number_of_installations, installed_capacity. Thus in the following, the separating items are defined, the district tables split in parts, all put in one list and afterwards transferred to a pandas DataFrame.
+# The rtf file has one table for each district in the rtf-file which needs to be separated from each and other and restructured to get all plants in one DataFrame with the information: district, energy_source, number_of_installations, installed_capacity. Thus in the following, the separating items and the patterns of the district and table cells are defined. The file is read line by line in a single pass, which yields one record per district and installation type, and afterwards transferred to a pandas DataFrame.
+# 
+# The Polish characters of the district names are written as rtf unicode escapes, e.g. \uc0\u322 for ł, which are decoded.
 
 # In[116]:
 
@@ -1078,101 +2126,93 @@ sep_split_into_parts = r'{\fs12 \f1 \line }'
 # separates the table rows of each table
 sep_data_parts = r'\trql'
 
-reg_exp_district = r'(?<=Powiat:).*(?=})'
+reg_exp_district = re.compile(r'(?<=Powiat:).*(?=})')
 
-reg_exp_installation_type = (
+reg_exp_installation_type = re.compile(
     r'(?<=\\fs12 \\f1 \\pard \\intbl \\ql \\cbpat[2|3|4] \{\\fs12 \\f1  ).*(?=\})')
-reg_exp_installation_value = (
+reg_exp_installation_value = re.compile(
     r'(?<=\\fs12 \\f1 \\pard \\intbl \\qr \\cbpat[3|4] \{\\fs12 \\f1 ).*(?=})')
 
-# split file into parts
-parts = file_content.split(sep_split_into_parts)
-
-
-# In[117]:
-
-# list containing the data
-data_set = []
-for part in parts:
-    # match district
-    district = re.findall(reg_exp_district, part)
-    if len(district) == 0:
-        pass
-    else:
-        district = district[0].lstrip()
-        # separate each part
-        data_parts = part.split(sep_data_parts)
-        # data structure: data_row = {'district': '', 'install_type': '', 'quantity': '', 'power': ''}
-        for data_rows in data_parts:
-            wrapper_list = []
-            # match each installation type
-            installation_type = re.findall(reg_exp_installation_type, data_rows)
-            for inst_type in installation_type:
-                wrapper_list.append({'district': district, 'energy_source_subtype': inst_type})
-            # match data - contains twice as many entries as installation type (quantity, power vs. install type)
-            data_values = re.findall(reg_exp_installation_value, data_rows)
-            if len(data_values) == 0:
-                #log.debug('data values empty')
-                pass
-            else:
-                # connect data
-                for i, _ in enumerate(wrapper_list):
-                    wrapper_list[i]['number_of_installations'] = data_values[(i * 2)]
-                    wrapper_list[i]['electrical_capacity'] = data_values[(i * 2) + 1]
-
-                # prepare to write to file
-                for data in wrapper_list:
-                    data_set.append(data)
+# rtf unicode escape with its trailing whitespace
+reg_exp_unicode = re.compile(r'\\uc0\\u(-?\d+) ?')
 
 
 # In[118]:
 
-# mapping of malformed unicode which appear in the Polish district names
-polish_truncated_unicode_map = {
-    r'\uc0\u322': 'ł',
-    r'\uc0\u380': 'ż',
-    r'\uc0\u243': 'ó',
-    r'\uc0\u347': 'ś',
-    r'\uc0\u324': 'ń',
-    r'\uc0\u261': 'ą',
-    r'\uc0\u281': 'ę',
-    r'\uc0\u263': 'ć',
-    r'\uc0\u321': 'Ł',
-    r'\uc0\u378': 'ź',
-    r'\uc0\u346': 'Ś',
-    r'\uc0\u379': 'Ż'
-}
+def decode_rtf_unicode(text):
+    """This function replaces the rtf unicode escapes in text by the 
+    characters. Negative numbers are used by rtf for codes above 32767."""
+    return reg_exp_unicode.sub(lambda match: chr(int(match.group(1)) % 65536),
+                               text)
+
+
+def table_records(district, rows):
+    """This function yields the records of the table rows of a district. 
+    The values of a row contain the number of installations and the 
+    capacity of each installation type."""
+    for installation_types, data_values in rows:
+        if len(data_values) == 0:
+            continue
+        for i, inst_type in enumerate(installation_types):
+            yield (district, inst_type, 
+                   data_values[(i * 2)], data_values[(i * 2) + 1])
+
+
+def iter_PL_records(rtf_path):
+    """This function reads the Polish rtf-file in a single pass and yields
+    a tuple of district, energy_source_subtype, number_of_installations 
+    and electrical_capacity per district and installation type."""
+    district = None
+    # rows of the current part, which are kept until its district is found
+    rows = []
+    installation_types, data_values = [], []
+
+    with open(rtf_path, 'r', encoding='iso-8859-2') as rtf:
+        for line in rtf:
+            for i, part in enumerate(line.split(sep_split_into_parts)):
+                if i > 0:
+                    # a new part starts, parts without district are skipped
+                    rows.append((installation_types, data_values))
+                    installation_types, data_values = [], []
+                    if district is not None:
+                        yield from table_records(district, rows)
+                    district, rows = None, []
+
+                if district is None:
+                    match = reg_exp_district.search(part)
+                    if match:
+                        district = decode_rtf_unicode(match.group(0).lstrip())
+
+                for j, data_rows in enumerate(part.split(sep_data_parts)):
+                    if j > 0:
+                        rows.append((installation_types, data_values))
+                        installation_types, data_values = [], []
+                    installation_types += reg_exp_installation_type.findall(data_rows)
+                    data_values += reg_exp_installation_value.findall(data_rows)
+
+            if district is not None:
+                yield from table_records(district, rows)
+                rows = []
+
+    rows.append((installation_types, data_values))
+    if district is not None:
+        yield from table_records(district, rows)
 
 
 # In[119]:
 
-# changing malformed unicode
-for entry in data_set:
-    while r'\u' in entry['district']:
-        index = entry['district'].index(r'\u')
-        offset = index + 9
-        to_be_replaced = entry['district'][index:offset]
-        if to_be_replaced in polish_truncated_unicode_map.keys():
-            # offset + 1 because there is a trailing whitespace
-            entry['district'] = entry['district'].replace(entry['district'][index:offset + 1],
-                                                  polish_truncated_unicode_map[to_be_replaced])
-        else:
-            break
-
-
-# In[120]:
-
-# Create pandas DataFrame with similar structure as the other countries
-PL_re_df = pd.DataFrame(data_set)
+def read_PL(rtf_path):
+    """This function reads the tables of the Polish rtf-file and returns 
+    them as one DataFrame."""
+    # Create pandas DataFrame with similar structure as the other countries
+    return pd.DataFrame.from_records(iter_PL_records(rtf_path),
+                                     columns=['district', 'energy_source_subtype',
+                                              'number_of_installations',
+                                              'electrical_capacity'])
 
 
 # ### 3.4.3 Add data source
 
-# In[121]:
-
-PL_re_df['data_source'] = 'Urzad Regulacji Energetyki'
-
-
 # ### 3.4.4 Translate values and harmonize energy source
 
 # In[122]:
@@ -1182,58 +2222,53 @@ value_dict_PL = valuenames.loc[idx_PL].set_index('original_name')['opsd_name'].t
 value_dict_PL
 
 
-# In[123]:
-
-PL_re_df.head()
-
-
-# In[124]:
-
-# Replace install_type descriptions with energy_source subtype
-PL_re_df.energy_source_subtype.replace(value_dict_PL, inplace=True)
-
-
 # **Assign energy_source_subtype to energy_source**
 
 # In[125]:
 
 # Create dictionnary in order to assign energy_source to its subtype
 energy_source_dict_PL = valuenames.loc[idx_PL].set_index('opsd_name')['energy_source'].to_dict()
-
-# Create new column for energy_source
-PL_re_df['energy_source'] = PL_re_df.energy_source_subtype
-
-# Fill this with the energy source instead of subtype information
-PL_re_df.energy_source.replace(energy_source_dict_PL, inplace=True)
-
-
-# In[126]:
-
 energy_source_dict_PL
 
 
 # ** Adjust datatype of numeric columns**
+# 
+# **Aggregate**
+# 
+# For entries/rows of the same district and energy_source_subtype, electrical capacity and number of installations are aggregaated.
 
 # In[127]:
 
-# change type to numeric
-PL_re_df['electrical_capacity'] = pd.to_numeric(PL_re_df['electrical_capacity'])
-# Additionally commas are deleted
-PL_re_df['number_of_installations'] = pd.to_numeric(
-    PL_re_df['number_of_installations'].str.replace(',',''))
+def translate_PL(PL_re_df, value_dict, energy_source_dict):
+    """This function translates the Polish energy source subtypes, assigns
+    the energy source and aggregates the entries per district and subtype."""
+    PL_re_df = PL_re_df.copy()
+    PL_re_df['data_source'] = 'Urzad Regulacji Energetyki'
 
+    # Replace install_type descriptions with energy_source subtype
+    PL_re_df['energy_source_subtype'] = translate_series(PL_re_df['energy_source_subtype'],
+                                                         value_dict)
 
-# **Aggregate**
-# 
-# For entries/rows of the same district and energy_source_subtype, electrical capacity and number of installations are aggregaated.
+    # Create new column for energy_source
+    PL_re_df['energy_source'] = PL_re_df.energy_source_subtype
+
+    # Fill this with the energy source instead of subtype information
+    PL_re_df['energy_source'] = translate_series(PL_re_df['energy_source'],
+                                                 energy_source_dict)
 
-# In[128]:
+    # change type to numeric
+    PL_re_df['electrical_capacity'] = pd.to_numeric(PL_re_df['electrical_capacity'])
+    # Additionally commas are deleted
+    PL_re_df['number_of_installations'] = pd.to_numeric(
+        PL_re_df['number_of_installations'].str.replace(',',''))
 
-PL_re_df = PL_re_df.groupby(['district','energy_source','energy_source_subtype'],
-                            as_index = False
-                            ).agg({'electrical_capacity': sum,
-                                   'number_of_installations': sum,
-                                   'data_source': 'first'})
+    PL_re_df = PL_re_df.groupby(['district','energy_source','energy_source_subtype'],
+                                as_index = False,
+                                observed = True
+                                ).agg({'electrical_capacity': sum,
+                                       'number_of_installations': sum,
+                                       'data_source': 'first'})
+    return PL_re_df
 
 
 # ### 3.4.5 Georeferencing - _work in progress_
@@ -1251,7 +2286,122 @@ PL_re_df = PL_re_df.groupby(['district','energy_source','energy_source_subtype']
 
 # In[130]:
 
-PL_re_df.to_pickle('PL_renewables.pickle')
+def process_PL():
+    """This function runs all stages of the Polish data, saves and returns
+    the resulting DataFrame."""
+    PL_re_df = run_stage('PL_read', read_PL, 'input/original_data/simple.rtf')
+    PL_re_df = run_stage('PL_translate', translate_PL, PL_re_df, value_dict_PL,
+                         energy_source_dict_PL)
+
+    save_processed(PL_re_df, 'PL')
+    return PL_re_df
+
+
+# ## 3.5 Process all countries
+# 
+# The tasks of all countries are run in parallel, see _2.10 Parallel processing of the countries_. The tasks of the other countries are continued if one country fails.
+
+# In[ ]:
+
+country_tasks = OrderedDict([
+    # The German registers take longest, thus they are started first
+    ('DE', (process_DE, [])),
+    ('DK', (process_DK, [])),
+    ('FR', (process_FR, [])),
+    ('PL', (process_PL, []))])
+
+country_results, country_errors = run_tasks(country_tasks)
+country_errors
+
+
+# **Germany: summary of DataFrame**
+# 
+# The summaries of a country are skipped if its task failed.
+
+# In[ ]:
+
+DE_renewables = country_results.get('DE')
+if DE_renewables is None:
+    logger.warning('No summary of DE: %s', country_errors['DE'])
+else:
+    DE_renewables.info()
+
+
+# In[62]:
+
+# Electrical capacity per energy_source (in MW)
+if DE_renewables is not None:
+    print(DE_renewables.groupby(['energy_source'])['electrical_capacity'].sum())
+
+
+# In[63]:
+
+# Electrical capacity per energy_source_subtype (in MW)
+if DE_renewables is not None:
+    print(DE_renewables.groupby(['energy_source_subtype'])['electrical_capacity'].sum())
+
+
+# **How many different utm_zone values are in the data set?**
+
+# In[67]:
+
+if DE_renewables is not None:
+    print(DE_renewables.groupby(['utm_zone'])['utm_zone'].count())
+
+
+# **Check: missing coordinates by data source and type**
+
+# In[70]:
+
+if DE_renewables is not None:
+    print('Missing Coordinates ', DE_renewables.lat.isnull().sum())
+    print(DE_renewables['coordinate_source'].value_counts())
+
+    print(DE_renewables[DE_renewables.lat.isnull()].groupby(['energy_source',
+                                                       'data_source']
+                                                      )['data_source'].count())
+
+
+# **Denmark**
+
+# In[87]:
+
+DK_renewables = country_results.get('DK')
+if DK_renewables is None:
+    logger.warning('No summary of DK: %s', country_errors['DK'])
+else:
+    print('Missing Coordinates DK_wind ',
+          DK_renewables[DK_renewables['energy_source'] == 'Wind'].lat.isnull().sum())
+    print('Missing Coordinates DK_solar ',
+          DK_renewables[DK_renewables['energy_source'] == 'Solar'].lat.isnull().sum())
+
+
+# In[92]:
+
+if DK_renewables is not None:
+    print(DK_renewables.head(2))
+
+
+# **France**
+
+# In[110]:
+
+FR_re_df = country_results.get('FR')
+if FR_re_df is None:
+    logger.warning('No summary of FR: %s', country_errors['FR'])
+else:
+    print(FR_re_df.head(2))
+
+
+# **Poland**
+
+# In[123]:
+
+PL_re_df = country_results.get('PL')
+if PL_re_df is None:
+    logger.warning('No summary of PL: %s', country_errors['PL'])
+else:
+    print(PL_re_df.head())
 
 
 # Check and validation of the renewable power plants list as well as the creation of CSV/XLSX/SQLite files can be found in Part 2 of this script. It also generates a daily time series of cumulated installed capacities by energy source.
@@ -0,0 +1,41 @@
+"""Access to the functions of the notebook scripts in tests.
+
+The notebook scripts download and process the data as soon as they are run,
+thus they can not be imported. load_script runs only the imports and the
+requested top-level definitions of a script instead.
+"""
+
+import ast
+import logging
+import os
+import sys
+
+script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_script(filename, names, **namespace):
+    """This function returns the namespace of the script filename after 
+    running its imports and its top-level functions and assignments of the
+    given names. namespace holds further globals, e.g. settings."""
+    path = os.path.join(script_dir, filename)
+    with open(path, encoding='utf-8') as script:
+        tree = ast.parse(script.read(), path)
+
+    body = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            body.append(node)
+        elif isinstance(node, ast.FunctionDef) and node.name in names:
+            body.append(node)
+        elif isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id in names
+                for target in node.targets):
+            body.append(node)
+
+    globals_ = {'__name__': 'notebook', 
+                'logger': logging.getLogger('notebook')}
+    globals_.update(namespace)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    exec(compile(ast.Module(body=body, type_ignores=[]), path, 'exec'), globals_)
+    return globals_
@@ -0,0 +1,122 @@
+"""Tests of the parser of the Polish rtf-file against the split/findall
+algorithm it replaced."""
+
+import os
+import re
+
+from notebook import load_script
+
+notebook = load_script('download_and_process.py',
+                       ['sep_split_into_parts', 'sep_data_parts',
+                        'reg_exp_district', 'reg_exp_installation_type',
+                        'reg_exp_installation_value', 'reg_exp_unicode',
+                        'decode_rtf_unicode', 'table_records',
+                        'iter_PL_records'])
+
+
+def type_cell(name, pattern=2):
+    return (r'\fs12 \f1 \pard \intbl \ql \cbpat{0} {{\fs12 \f1  {1}}}'
+            .format(pattern, name))
+
+
+def value_cell(value, pattern=3):
+    return (r'\fs12 \f1 \pard \intbl \qr \cbpat{0} {{\fs12 \f1 {1}}}'
+            .format(pattern, value))
+
+
+# Three districts with Polish characters, a header without district, table
+# rows spanning several lines and a row with two installation types
+rtf = '\n'.join([
+    r'{\rtf1\ansi\ansicpg1250 {\fs12 \f1 Wykaz instalacji}',
+    r'\trowd \trql',
+    type_cell('Naglowek'),
+    value_cell('0'),
+    value_cell('0') + r'\row',
+    r'{\fs12 \f1 \line }{\fs12 \f1 Powiat: bia\uc0\u322 ostocki}',
+    r'\trowd \trql',
+    type_cell('elektrownie wiatrowe'),
+    value_cell('12'),
+    value_cell('24,500') + r'\row \trowd \trql',
+    type_cell('biogaz', 3),
+    type_cell('biomasa', 4),
+    value_cell('1', 4),
+    value_cell('0,800', 4),
+    value_cell('2', 4),
+    value_cell('3,100', 4) + r'\row',
+    r'{\fs12 \f1 \line }{\fs12 \f1 Powiat: \uc0\u321 \uc0\u243 d\uc0\u378 }'
+    r'\trowd \trql',
+    type_cell(r'elektrownie s\uc0\u322 oneczne'),
+    value_cell('1,204'),
+    value_cell('5,250') + r'\row',
+    r'{\fs12 \f1 \line }',
+    r'{\fs12 \f1 Powiat: \uc0\u379 ywiecki}',
+    r'\trowd \trql',
+    type_cell('elektrownie wodne'),
+    r'\cell',
+    value_cell('4'),
+    r'\cell',
+    value_cell('0,350') + r'\row',
+    '}'])
+
+
+def old_PL_records(file_content):
+    """The split/findall algorithm of the original notebook."""
+    polish_truncated_unicode_map = {
+        r'\uc0\u322': 'ł', r'\uc0\u380': 'ż', r'\uc0\u243': 'ó',
+        r'\uc0\u347': 'ś', r'\uc0\u324': 'ń', r'\uc0\u261': 'ą',
+        r'\uc0\u281': 'ę', r'\uc0\u263': 'ć', r'\uc0\u321': 'Ł',
+        r'\uc0\u378': 'ź', r'\uc0\u346': 'Ś', r'\uc0\u379': 'Ż'}
+    reg_exp_district = r'(?<=Powiat:).*(?=})'
+    reg_exp_installation_type = (
+        r'(?<=\\fs12 \\f1 \\pard \\intbl \\ql \\cbpat[2|3|4] \{\\fs12 \\f1  ).*(?=\})')
+    reg_exp_installation_value = (
+        r'(?<=\\fs12 \\f1 \\pard \\intbl \\qr \\cbpat[3|4] \{\\fs12 \\f1 ).*(?=})')
+
+    data_set = []
+    for part in file_content.split(r'{\fs12 \f1 \line }'):
+        district = re.findall(reg_exp_district, part)
+        if len(district) == 0:
+            continue
+        district = district[0].lstrip()
+        for data_rows in part.split(r'\trql'):
+            wrapper_list = []
+            for inst_type in re.findall(reg_exp_installation_type, data_rows):
+                wrapper_list.append({'district': district,
+                                     'energy_source_subtype': inst_type})
+            data_values = re.findall(reg_exp_installation_value, data_rows)
+            if len(data_values) == 0:
+                continue
+            for i, _ in enumerate(wrapper_list):
+                wrapper_list[i]['number_of_installations'] = data_values[(i * 2)]
+                wrapper_list[i]['electrical_capacity'] = data_values[(i * 2) + 1]
+            data_set += wrapper_list
+
+    for entry in data_set:
+        while r'\u' in entry['district']:
+            index = entry['district'].index(r'\u')
+            offset = index + 9
+            to_be_replaced = entry['district'][index:offset]
+            if to_be_replaced in polish_truncated_unicode_map.keys():
+                entry['district'] = entry['district'].replace(
+                    entry['district'][index:offset + 1],
+                    polish_truncated_unicode_map[to_be_replaced])
+            else:
+                break
+    return [(entry['district'], entry['energy_source_subtype'],
+             entry['number_of_installations'], entry['electrical_capacity'])
+            for entry in data_set]
+
+
+def test_parser_returns_the_records_of_the_old_algorithm(tmp_path):
+    rtf_path = os.path.join(str(tmp_path), 'simple.rtf')
+    with open(rtf_path, 'w', encoding='iso-8859-2') as file:
+        file.write(rtf)
+
+    records = list(notebook['iter_PL_records'](rtf_path))
+    assert records == old_PL_records(rtf)
+    assert records == [
+        ('białostocki', 'elektrownie wiatrowe', '12', '24,500'),
+        ('białostocki', 'biogaz', '1', '0,800'),
+        ('białostocki', 'biomasa', '2', '3,100'),
+        ('Łódź', r'elektrownie s\uc0\u322 oneczne', '1,204', '5,250'),
+        ('Żywiecki', 'elektrownie wodne', '4', '0,350')]
@@ -0,0 +1,37 @@
+"""Tests of the conversion of DataFrames to Arrow tables."""
+
+import logging
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from notebook import load_script
+
+download = load_script('download_and_process.py', [])
+validation = load_script('validation_and_output.py', ['write_parquet'])
+
+df = pd.DataFrame({'postcode': [1234, '0123x', None],
+                   'city': ['Flensburg', 'Berlin', None],
+                   'capacity': [1.5, 2, 3]})
+
+
+def test_only_mixed_columns_are_converted(caplog):
+    with caplog.at_level(logging.WARNING, logger='notebook'):
+        result = download['dataframe_to_arrow'](df).to_pandas()
+
+    assert result['postcode'].tolist() == ['1234', '0123x', None]
+    pd.testing.assert_series_equal(result['city'], df['city'])
+    pd.testing.assert_series_equal(result['capacity'], df['capacity'])
+    assert [record.args[0] for record in caplog.records] == ['postcode']
+
+
+def test_parquet_export_uses_the_same_conversion(caplog, tmp_path):
+    path = os.path.join(str(tmp_path), 'export.parquet')
+    with caplog.at_level(logging.WARNING, logger='notebook'):
+        validation['write_parquet'](df, path)
+    assert [record.args[0] for record in caplog.records] == ['postcode']
+
+    assert validation['dataframe_to_arrow'] is download['dataframe_to_arrow']
+    pd.testing.assert_frame_equal(pq.read_table(path).to_pandas(),
+                                  download['dataframe_to_arrow'](df).to_pandas())
@@ -0,0 +1,65 @@
+"""Tests of the conversion of the BMWi statistics."""
+
+import os
+
+import pandas as pd
+import pytest
+
+from notebook import load_script
+
+energy_sources = ['Wasserkraft', 'Windenergie an Land', 'Windenergie auf See',
+                  'Photovoltaik', 'Biomasse', 'biogene flüssige Brennstoffe',
+                  'Biogas', 'Klärgas', 'Deponiegas', 'Geothermie', 'Summe']
+
+
+@pytest.fixture
+def notebook(tmp_path):
+    reads = []
+
+    def read_excel_cached(filepath, sheets=None, **kwargs):
+        # Stands in for reading sheet 4 of the workbook
+        reads.append(filepath)
+        return {'4': pd.DataFrame({'Energieträger': energy_sources,
+                                   '2014': range(11), '2015': range(11, 22)})}
+
+    notebook = load_script('download_and_process.py',
+                           ['download_chunksize', 'file_checksum', 'is_cached',
+                            'cached_checksum', 'bmwi_stat_is_current',
+                            'convert_bmwi_stat'],
+                           read_excel_cached=read_excel_cached,
+                           bmwi_stat_path=os.path.join(str(tmp_path),
+                                                       'bmwi_stat.parquet'))
+    notebook['reads'] = reads
+    return notebook
+
+
+def write(path, content, mtime):
+    with open(path, 'wb') as file:
+        file.write(content)
+    os.utime(path, (mtime, mtime))
+
+
+def test_conversion_is_skipped_for_the_same_workbook(notebook, tmp_path):
+    filepath = os.path.join(str(tmp_path), 'bmwi_stat.xlsx')
+    parquetpath = notebook['bmwi_stat_path']
+    write(filepath, b'workbook', 1000000000)
+
+    converted = notebook['convert_bmwi_stat'](filepath)
+    assert converted.index.tolist() == [2014, 2015]
+    assert converted['bmwi_total'].tolist() == [10, 21]
+
+    # Newer than the workbook
+    pd.testing.assert_frame_equal(notebook['convert_bmwi_stat'](filepath),
+                                  converted)
+    assert len(notebook['reads']) == 1
+
+    # The workbook is downloaded again with the same content
+    os.utime(parquetpath, (999999999, 999999999))
+    pd.testing.assert_frame_equal(notebook['convert_bmwi_stat'](filepath),
+                                  converted)
+    assert len(notebook['reads']) == 1
+
+    # The workbook changed
+    write(filepath, b'new workbook', 1000000001)
+    notebook['convert_bmwi_stat'](filepath)
+    assert len(notebook['reads']) == 2
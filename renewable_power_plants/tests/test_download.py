@@ -0,0 +1,150 @@
+"""Tests of the downloader of download_and_process against a local stand-in
+HTTP server."""
+
+import gzip
+import hashlib
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+from notebook import load_script
+
+content = bytes(range(256)) * 4096
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """Serves /file, /gzip (gzip Content-Encoding) and /truncated (ends
+    before Content-Length), /file with support of Range requests."""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get('Range')))
+        self.server.authorization[self.path] = self.headers.get('Authorization')
+        if self.path == '/gzip':
+            body = gzip.compress(content)
+            self.send_response(200)
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == '/truncated':
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content[:1000])
+        elif self.headers.get('Range'):
+            offset = int(self.headers['Range'][len('bytes='):].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(
+                offset, len(content) - 1, len(content)))
+            self.send_header('Content-Length', str(len(content) - offset))
+            self.end_headers()
+            self.wfile.write(content[offset:])
+        else:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.requests = []
+    server.authorization = {}
+    server.url = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope='module')
+def notebook():
+    return load_script('download_and_process.py',
+                       ['download_chunksize', 'download_workers',
+                        'download_session', 'file_checksum', 'is_cached',
+                        'fetch', 'download_and_cache', 'download_all'])
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_download_is_cached(notebook, server, tmp_path):
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = notebook['download_and_cache'](server.url + '/file',
+                                          sha256=sha256,
+                                          directory=str(tmp_path))
+    assert read(path) == content
+    assert not os.path.exists(path + '.part')
+    with open(path + '.download.json') as file:
+        assert json.load(file)['sha256'] == sha256
+
+    # The second call uses the verified file without requesting it
+    assert notebook['download_and_cache'](server.url + '/file', sha256=sha256,
+                                          directory=str(tmp_path)) == path
+    assert len(server.requests) == 1
+
+
+def test_modified_file_is_downloaded_again(notebook, server, tmp_path):
+    path = notebook['download_and_cache'](server.url + '/file',
+                                          directory=str(tmp_path))
+    with open(path, 'ab') as file:
+        file.write(b'changed')
+    notebook['download_and_cache'](server.url + '/file',
+                                   directory=str(tmp_path))
+    assert read(path) == content
+    assert len(server.requests) == 2
+
+
+def test_partial_download_is_resumed(notebook, server, tmp_path):
+    with open(os.path.join(str(tmp_path), 'file.part'), 'wb') as file:
+        file.write(content[:5000])
+    path = notebook['download_and_cache'](server.url + '/file',
+                                          size=len(content),
+                                          directory=str(tmp_path))
+    assert read(path) == content
+    assert server.requests == [('/file', 'bytes=5000-')]
+
+
+def test_gzip_encoded_download(notebook, server, tmp_path):
+    path = notebook['download_and_cache'](server.url + '/gzip',
+                                          size=len(content),
+                                          directory=str(tmp_path))
+    assert read(path) == content
+
+
+def test_truncated_download_is_kept_as_part(notebook, server, tmp_path):
+    with pytest.raises(IOError):
+        notebook['download_and_cache'](server.url + '/truncated',
+                                       directory=str(tmp_path))
+    assert not os.path.exists(os.path.join(str(tmp_path), 'truncated'))
+    assert os.path.exists(os.path.join(str(tmp_path), 'truncated.part'))
+
+
+def test_download_all(notebook, server, tmp_path):
+    filepaths = notebook['download_all'](
+        {'plain': {'url': server.url + '/file', 'directory': str(tmp_path)},
+         'encoded': {'url': server.url + '/gzip', 'directory': str(tmp_path)}})
+    assert read(filepaths['plain']) == content
+    assert read(filepaths['encoded']) == content
+
+
+def test_source_with_own_session_gets_no_credentials(notebook, server, tmp_path):
+    session = notebook['download_session']()
+    session.auth = ('beta', 'password')
+    notebook['download_all'](
+        {'opsd': {'url': server.url + '/file', 'directory': str(tmp_path)},
+         'third_party': {'url': server.url + '/gzip', 'directory': str(tmp_path),
+                         'session': notebook['download_session']()}},
+        session)
+    assert server.authorization['/file'].startswith('Basic ')
+    assert server.authorization['/gzip'] is None
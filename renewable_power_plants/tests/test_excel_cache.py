@@ -0,0 +1,23 @@
+"""Tests of the Parquet cache of Excel files."""
+
+import os
+
+import pandas as pd
+
+from notebook import load_script
+
+
+def test_cold_and_warm_run_return_the_same_data(tmp_path):
+    notebook = load_script('download_and_process.py',
+                           ['download_chunksize', 'file_checksum', 'is_cached',
+                            'cached_checksum',
+                            'read_excel_cached'],
+                           parquet_cache=str(tmp_path))
+    filepath = os.path.join(str(tmp_path), 'register.xlsx')
+    pd.DataFrame({'postcode': [24943, '0123x', None],
+                  'capacity': [1.5, 2.0, 3.0]}).to_excel(filepath, index=False)
+
+    cold = notebook['read_excel_cached'](filepath, ['Sheet1'])['Sheet1']
+    warm = notebook['read_excel_cached'](filepath, ['Sheet1'])['Sheet1']
+    pd.testing.assert_frame_equal(cold, warm)
+    assert cold['postcode'].tolist() == ['24943', '0123x', None]
@@ -0,0 +1,96 @@
+"""Tests of the incremental processing of the German data."""
+
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from notebook import load_script
+
+value_dict = {'Windkraft': 'Wind', 'Biomasse': 'Biomass'}
+energy_source_dict = {'Wind': 'Wind', 'Biomass': 'Bioenergy'}
+
+
+@pytest.fixture
+def notebook(tmp_path, monkeypatch):
+    # The snapshot is stored in the working directory
+    monkeypatch.chdir(tmp_path)
+    return load_script('download_and_process.py',
+                       ['snapshot_keys', 'select_changed_DE',
+                        'patch_unchanged_DE', 'translate_series',
+                        'translate_values', 'capacity_columns_DE',
+                        'translate_DE', 'geocode', 'utm_to_latlon',
+                        'report_conversion_errors', 'resolve_coordinates',
+                        'geocode_DE', 'float32_columns', 'integer_columns',
+                        'is_text', 'compact_frame', 'finalize_DE',
+                        'save_processed', 'read_processed'],
+                       incremental=True, memory_budget=False,
+                       processed_dataset=os.path.join(str(tmp_path), 'processed'))
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = os.path.join(str(tmp_path), 'geocoding_index.arrow')
+    table = pa.Table.from_pandas(pd.DataFrame({
+        'country': ['DE', 'DE'],
+        'key_type': ['postcode', 'postcode'],
+        'key': ['24943', '10115'],
+        'lat': [54.78, 52.53],
+        'lon': [9.43, 13.38]}), preserve_index=False)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def merged(entries):
+    """Returns the merged German DataFrame of (eeg_id, energy_source,
+    capacity, postcode) entries."""
+    eeg_id, energy_source, capacity, postcode = zip(*entries)
+    return pd.DataFrame({
+        'eeg_id': list(eeg_id),
+        'commissioning_date': pd.to_datetime(['2015-01-01'] * len(entries)),
+        'energy_source': list(energy_source),
+        'electrical_capacity_kW': list(capacity),
+        'thermal_capacity_kW': [None] * len(entries),
+        'postcode': list(postcode),
+        'data_source': ['TenneT'] * len(entries),
+        'bnetza_id': [None] * len(entries),
+        'utm_zone': [32.0] * len(entries),
+        'utm_east': [32413151.72] + [None] * (len(entries) - 1),
+        'utm_north': [6027467.73] + [None] * (len(entries) - 1)})
+
+
+def process(notebook, DE_renewables, index_path):
+    DE_renewables, DE_snapshot, DE_unchanged = notebook['select_changed_DE'](
+        DE_renewables)
+    DE_renewables = notebook['translate_DE'](DE_renewables, value_dict,
+                                             energy_source_dict)
+    DE_renewables = notebook['geocode_DE'](DE_renewables, index_path)
+    DE_renewables = notebook['finalize_DE'](
+        notebook['patch_unchanged_DE'](DE_renewables, DE_unchanged))
+    notebook['save_processed'](DE_renewables, 'DE')
+    DE_snapshot.to_pickle('DE_renewables_snapshot.pickle')
+    return DE_renewables
+
+
+def test_incremental_run_returns_the_full_result(notebook, index_path, capsys):
+    previous = merged([('E1', 'Windkraft', 2000.0, '24943'),
+                       ('E2', 'Biomasse', 500.0, '10115'),
+                       ('E3', 'Windkraft', 3000.0, '24943'),
+                       ('E4', 'Biomasse', 250.0, None)])
+    current = merged([('E1', 'Windkraft', 2000.0, '24943'),
+                      ('E2', 'Biomasse', 550.0, '10115'),
+                      ('E4', 'Biomasse', 250.0, None),
+                      ('E5', 'Windkraft', 100.0, '10115')])
+
+    process(notebook, previous, index_path)
+    capsys.readouterr()
+    incremental = process(notebook, current, index_path)
+    assert capsys.readouterr().out.splitlines()[0] == (
+        'Unchanged entries: 2 - new or changed entries: 2 - removed entries: 1')
+
+    os.remove('DE_renewables_snapshot.pickle')
+    full = process(notebook, current, index_path)
+    pd.testing.assert_frame_equal(incremental, full)
@@ -0,0 +1,58 @@
+"""Tests of the memory budget mode."""
+
+import os
+
+import pandas as pd
+
+from notebook import load_script
+
+notebook = load_script('download_and_process.py',
+                       ['float32_columns', 'integer_columns', 'is_text',
+                        'compact_frame', 'concat_frames', 'finalize_DE',
+                        'save_processed', 'read_processed'],
+                       memory_budget=True)
+
+
+def test_categorical_and_datetime_frames_keep_their_values():
+    tso = pd.DataFrame({
+        'decommissioning_date': pd.to_datetime(['2015-01-01', None]),
+        'energy_source': ['Wind', 'Solar'],
+        'postcode': [24943, 10115]})
+    bnetza = pd.DataFrame({
+        'decommissioning_date': ['2014-05-01', ''],
+        'energy_source': ['Biomass', 'Wind'],
+        'postcode': ['0123x', None],
+        'dso': ['SH Netz', 'E.DIS']})
+
+    result = notebook['concat_frames']([tso, bnetza])
+
+    assert result['decommissioning_date'].tolist()[2:] == ['2014-05-01', '']
+    assert result['decommissioning_date'].iloc[0] == pd.Timestamp('2015-01-01')
+    assert result['postcode'].tolist()[:3] == [24943, 10115, '0123x']
+    assert result['postcode'].dtype == object
+    assert result['energy_source'].dtype.name == 'category'
+    assert result['energy_source'].tolist() == ['Wind', 'Solar', 'Biomass', 'Wind']
+    assert result['dso'].dtype.name == 'category'
+    assert result['dso'].tolist()[2:] == ['SH Netz', 'E.DIS']
+    assert result['dso'].isnull().tolist()[:2] == [True, True]
+
+
+def test_mixed_columns_are_saved(tmp_path):
+    notebook['processed_dataset'] = os.path.join(str(tmp_path), 'processed')
+    tso = pd.DataFrame({'energy_source': ['Wind', 'Solar'],
+                        'postcode': [24943, 10115],
+                        'electrical_capacity': [1.5, 0.01]})
+    bnetza = pd.DataFrame({'energy_source': ['Wind'],
+                           'postcode': ['0123x'],
+                           'electrical_capacity': [2.0]})
+    DE_renewables = notebook['finalize_DE'](
+        notebook['concat_frames']([tso, bnetza]).reset_index(drop=True))
+    assert DE_renewables['postcode'].dtype == object
+    assert DE_renewables['electrical_capacity'].dtype == 'float32'
+
+    notebook['save_processed'](DE_renewables, 'DE')
+    saved = notebook['read_processed']('DE').sort_index()
+    assert saved['postcode'].tolist() == ['24943', '10115', '0123x']
+    assert saved['energy_source'].astype(str).tolist() == ['Wind', 'Solar', 'Wind']
+    assert saved['electrical_capacity'].tolist() == DE_renewables[
+        'electrical_capacity'].tolist()
@@ -0,0 +1,171 @@
+"""Tests of the stream mode of the German data against the batch mode."""
+
+import concurrent.futures
+import os
+import zipfile
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from notebook import load_script
+
+names = ['dtype_DE', 'dtype_DK', 'source_schemas', 'read_schema', 'parse_dates', 'utm_to_latlon',
+         'report_conversion_errors', 'resolve_coordinates', 'translate_series',
+         'translate_values', 'geocode', 'float32_columns', 'integer_columns',
+         'is_text', 'compact_frame', 'concat_frames', 'tso_names',
+         'tso_csv_options',
+         'tso_filename', 'resolve_tso_dtypes', 'read_tso_frames',
+         'read_tso_csv', 'read_arrow', 'read_DE', 'decom_fkt', 'DE_sources',
+         'prepare_DE', 'merge_DE', 'capacity_columns_DE', 'translate_DE',
+         'geocode_DE', 'processing_columns_DE', 'process_DE_part',
+         'stream_tso_csv', 'stream_DE', 'finalize_DE']
+
+columnnames = pd.DataFrame(
+    [('DE', 'Anlagenschluessel', 'eeg_id'),
+     ('DE', 'Inbetriebnahme', 'commissioning_date'),
+     ('DE', 'Ausserbetriebnahme', 'decommissioning_date'),
+     ('DE', 'Energietraeger', 'energy_source'),
+     ('DE', 'Nennleistung', 'electrical_capacity_kW'),
+     ('DE', 'PLZ', 'postcode'),
+     ('DE', 'Spannungsebene', 'voltage_level'),
+     ('DE', 'Bundesland', 'federal_state')],
+    columns=['country', 'original_name', 'opsd_name'])
+
+value_dict = {'Windkraft': 'Wind', 'Solarstrom': 'Photovoltaics',
+              'Biomasse': 'Biomass', 'MS': 'Medium voltage'}
+energy_source_dict = {'Wind': 'Wind', 'Photovoltaics': 'Solar',
+                      'Biomass': 'Bioenergy'}
+
+header = ('Anlagenschluessel;Inbetriebnahme;Energietraeger;Nennleistung;PLZ;'
+          'Spannungsebene;Anzahl;Bemerkung')
+rows = ['E1{0:04d};{1};{2};{3};{4};{5};{6};{7}'.format(
+            number,
+            '0{0}.03.2014'.format(number % 9 + 1) if number % 4 else '2014-05-0{0}'.format(number % 9 + 1),
+            ['Windkraft', 'Solarstrom', 'Biomasse'][number % 3],
+            '1.{0:03d},5'.format(number) if number % 2 else str(number),
+            ['24943', '10115', '024xx', ''][number % 4],
+            ['MS', 'HS', ''][number % 3],
+            number if number < 5 else '{0},5'.format(number),
+            number if number < 4 else ['Windkraft', 'Repowering'][number % 2])
+        for number in range(11)]
+
+
+def write_register(path):
+    with zipfile.ZipFile(path, 'w') as netztransparenz_zip:
+        for number, tso in enumerate(['Amprion', '50Hertz', 'TenneT', 'TransnetBW']):
+            lines = [header] + rows[number:]
+            if tso == 'TenneT':
+                # Only one register has decommissioning dates and federal states
+                lines = [header + ';Ausserbetriebnahme;Bundesland'] + [
+                    row + ';{0};{1}'.format('31.12.2015' if i % 2 else '',
+                                            'Niedersachsen' if i % 3 else '')
+                    for i, row in enumerate(rows)]
+            netztransparenz_zip.writestr(tso + '_Anlagenstammdaten_2015.csv',
+                                         '\n'.join(lines).encode('cp1252'))
+
+
+def read_bnetza(bnetza_path, bnetza_pv_path):
+    frames = OrderedDict()
+    frames['BNetzA'] = pd.DataFrame({
+        'commissioning_date': pd.to_datetime(['2015-02-01', '2016-03-01', None]),
+        'decommissioning_date': pd.Series([pd.Timestamp('2016-01-01'), None,
+                                           '2016-04-05'], dtype=object),
+        'notification_reason': pd.Categorical(['Inbetriebnahme', None, 'Erweiterung']),
+        'energy_source': pd.Categorical(['Windkraft', 'Biomasse', 'Windkraft']),
+        'electrical_capacity_kW': [2000.0, 500.0, None],
+        'thermal_capacity_kW': [None, 800.0, None],
+        'voltage_level': pd.Categorical(['HS', 'MS', None]),
+        'dso': pd.Categorical(['SH Netz', 'E.DIS', 'SH Netz']),
+        'eeg_id': ['E20001', None, 'E20003'],
+        'bnetza_id': ['B1', 'B2', 'B3'],
+        'federal_state': pd.Categorical(['Schleswig-Holstein', None, 'Berlin']),
+        'postcode': ['24943', '10115', None],
+        'municipality_code': ['01001000', None, '11000000'],
+        'municipality': ['Flensburg', 'Berlin', None],
+        'address': ['Hafen', None, 'Ufer'],
+        'address_number': ['1', '2a', None],
+        'utm_zone': [32, 32, 32],
+        'utm_east': [32413151.72, 413151.72, None],
+        'utm_north': [6027467.73, 6027467.73, None],
+        'unused': [1, 2, 3]})
+    frames['BNetzA_PV'] = pd.DataFrame({
+        'commissioning_date': pd.to_datetime(['2015-06-01', '2015-07-01']),
+        'electrical_capacity_kW': [9.8, 30.0],
+        'postcode': ['10115', '99999']})
+    return frames
+
+
+@pytest.fixture(params=[False, True], ids=['default', 'memory_budget'])
+def notebook(request):
+    # Functions loaded from a script can not be sent to processes, thus the
+    # registers of the TSOs are processed in threads
+    return load_script('download_and_process.py', names,
+                       columnnames=columnnames, csv_chunksize=3,
+                       memory_budget=request.param, read_bnetza=read_bnetza,
+                       process_pool=concurrent.futures.ThreadPoolExecutor)
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = os.path.join(str(tmp_path), 'geocoding_index.arrow')
+    table = pa.Table.from_pandas(pd.DataFrame({
+        'country': ['DE', 'DE', 'DE'],
+        'key_type': ['postcode', 'postcode', 'postcode'],
+        'key': ['24943', '10115', '024xx'],
+        'lat': [54.78, 52.53, 51.0],
+        'lon': [9.43, 13.38, 14.0]}), preserve_index=False)
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def test_stream_mode_returns_the_batch_result(notebook, index_path, tmp_path):
+    zip_path = os.path.join(str(tmp_path), 'netztransparenz.zip')
+    write_register(zip_path)
+    column_dict = columnnames.set_index('original_name')['opsd_name'].to_dict()
+
+    batch = notebook['read_DE'](zip_path, None, None)
+    batch = notebook['merge_DE'](batch, column_dict)
+    batch = notebook['translate_DE'](batch, value_dict, energy_source_dict)
+    batch = notebook['geocode_DE'](batch, index_path)
+    batch = notebook['finalize_DE'](batch)
+
+    stream = notebook['stream_DE'](zip_path, None, None, column_dict,
+                                   value_dict, energy_source_dict, index_path)
+    stream = notebook['finalize_DE'](stream)
+
+    pd.testing.assert_frame_equal(batch, stream)
+    assert len(stream) == 11 + 10 + 11 + 8 + 3 + 2
+    assert stream['energy_source'].dtype.name == 'category'
+    assert stream['coordinate_source'].value_counts()['utm'] == 2
+
+
+def test_dates_and_numbers_are_parsed_per_value(notebook, tmp_path):
+    zip_path = os.path.join(str(tmp_path), 'netztransparenz.zip')
+    write_register(zip_path)
+    dtype = notebook['resolve_tso_dtypes'](zip_path, 'Amprion')
+    df = next(notebook['read_tso_frames'](zip_path, 'Amprion', dtype))
+
+    assert df['Inbetriebnahme'].tolist()[:2] == [pd.Timestamp('2014-05-01'),
+                                                 pd.Timestamp('2014-03-02')]
+    assert df['Nennleistung'].tolist()[:2] == [0.0, 1001.5]
+    # Integers in the first chunks and decimals in the later ones
+    assert df['Anzahl'].dtype == float
+    # Numbers in the first chunks and text in the later ones
+    assert df['Bemerkung'].tolist()[:5] == ['0', '1', '2', '3', 'Windkraft']
+
+
+def test_batch_mode_infers_the_resolved_types(notebook, tmp_path):
+    zip_path = os.path.join(str(tmp_path), 'netztransparenz.zip')
+    write_register(zip_path)
+    dtype = notebook['resolve_tso_dtypes'](zip_path, 'Amprion')
+    streamed = pd.concat(notebook['read_tso_frames'](zip_path, 'Amprion', dtype,
+                                                     chunksize=3))
+    batch = notebook['read_arrow'](notebook['read_tso_csv'](zip_path, 'Amprion',
+                                                            str(tmp_path)))
+    for column in ['Nennleistung', 'Anzahl', 'Bemerkung', 'PLZ']:
+        pd.testing.assert_series_equal(batch[column], streamed[column],
+                                       check_index=False)
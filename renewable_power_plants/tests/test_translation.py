@@ -0,0 +1,30 @@
+"""Tests of the translation of values."""
+
+import pandas as pd
+
+from notebook import load_script
+
+notebook = load_script('download_and_process.py',
+                       ['translate_series', 'translate_values'])
+
+value_dict = {'s': '< 3', 'Windkraft': 'Wind', 'Wind an Land': 'Wind'}
+
+
+def test_text_columns_are_translated_as_categoricals():
+    df = pd.DataFrame({'energy_source': ['Windkraft', 'Wind an Land', None, 
+                                         'Solar']})
+    notebook['translate_values'](df, value_dict)
+    assert df['energy_source'].dtype.name == 'category'
+    assert df['energy_source'].dropna().tolist() == ['Wind', 'Wind', 'Solar']
+    assert df['energy_source'].isnull().tolist() == [False, False, True, False]
+    assert len(df['energy_source'].cat.categories) == 2
+
+
+def test_mixed_columns_keep_their_type():
+    df = pd.DataFrame({'number_of_installations': [12, 's', None, 3],
+                       'electrical_capacity': [1.5, 0.2, 0.1, 4.0]})
+    notebook['translate_values'](df, value_dict)
+    assert df['number_of_installations'].dtype == object
+    assert df['number_of_installations'].tolist()[:2] == [12, '< 3']
+    assert df['number_of_installations'].tolist()[3] == 3
+    assert df['electrical_capacity'].dtype == float
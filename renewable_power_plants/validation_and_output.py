@@ -7,21 +7,26 @@
 # importing all necessary Python libraries for this Script
 #%matplotlib inline
 
+import concurrent.futures
+import gzip
 import json
+import multiprocessing
+import sys
+from collections import OrderedDict
 import yaml  
 import posixpath
 import os
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import datetime  
 import sqlite3 
 import utm
 import logging
 import openpyxl
 import xlsxwriter
-from bokeh.charts import Scatter, Line,Bar, show, output_file
-from bokeh.io import output_notebook
-output_notebook()
+from arrow_tables import dataframe_to_arrow # shared with download_and_process
 
 # Set up a log
 logger = logging.getLogger('notebook')
@@ -35,98 +40,127 @@ os.makedirs('input/original_data', exist_ok=True)
 os.makedirs('output', exist_ok=True)
 os.makedirs('output/datapackage_renewables', exist_ok=True)
 
-
-# In[ ]:
-
-# Read data from script Part 1
-renewables = pd.read_sql('SELECT* FROM raw_data_output',
-                          sqlite3.connect('raw_data.sqlite')
-                        )
-# Correction of date format (necessary due to SQLite-format)
-renewables['start_up_date'] = renewables['start_up_date'
-                                        ].astype('datetime64[ns]')
-renewables['decommission_date'] = renewables['decommission_date'
-                                            ].astype('datetime64[ns]')
-
-renewables.info()
+# The plots of the validation report are rendered unless the script is run 
+# with --no-report, e.g. in scheduled batch runs
+report = '--no-report' not in sys.argv
+report_path = 'output/validation_report'
 
 
 # In[ ]:
 
-# Reorder data frame by start-up date
-renewables = renewables.ix[pd.to_datetime(renewables.start_up_date
-                                         ).sort_values().index]
+# Only the columns used by the validation and the final data frame are read
+raw_data_columns = ['start_up_date','electrical_capacity','energy_source',
+                    'energy_source_subtype','thermal_capacity','postcode',
+                    'city','address','tso','lon','lat','eeg_id',
+                    'power_plant_id','voltage_level','decommission_date',
+                    'source','notification_reason']
 
 
 # In[ ]:
 
-# Create empty marker column
-renewables['comment'] = ""
-
-# Validation criteria (R_1) for source BNetzA
-idx_date = renewables[(renewables['start_up_date'] <= '2014-12-31') 
-                      & (renewables['source'] == 'BNetzA')].index
-
-renewables.loc[idx_date,'comment'] = (renewables.loc[idx_date,'comment'] 
-                                      + "R_1, ")
-
-# Validation criteria (R_1) for source BNetzA_PV
-idx_date_pv = renewables[(renewables['start_up_date'] <= '2014-12-31') 
-                    & (renewables['source'] == 'BNetzA_PV')].index
-
-renewables.loc[idx_date_pv,'comment'] = (renewables.loc[
-                                      idx_date_pv,'comment'] + "R_1, ")
+# Read data from script Part 1 in one go. The database is only read, thus it
+# is opened read-only. The dates are parsed while reading (necessary due to 
+# SQLite-format)
+raw_data = sqlite3.connect('file:raw_data.sqlite?mode=ro', uri=True)
+
+# The index of the data frame of script Part 1 is kept, if it is stored
+stored_columns = [row[1] for row in 
+                  raw_data.execute('PRAGMA table_info(raw_data_output)')]
+index_col = 'index' if 'index' in stored_columns else None
+columns = raw_data_columns if index_col is None else [index_col] + raw_data_columns
+query = 'SELECT {0} FROM raw_data_output'.format(
+    ', '.join('"{0}"'.format(column) for column in columns))
+renewables = pd.read_sql(query, raw_data, index_col=index_col,
+                         parse_dates=['start_up_date', 'decommission_date'])
+renewables.index.name = None
+raw_data.close()
+
+# Reorder data frame by start-up date, entries without start-up date last
+renewables = renewables.sort_values('start_up_date', kind='mergesort',
+                                    na_position='last')
 
-# Validation criteria (R_2)
-idx_date_null = renewables[(renewables['start_up_date'].isnull())].index
-
-renewables.loc[idx_date_null,'comment'] = (renewables.loc[
-                                        idx_date_null,'comment'] + "R_2, ")
+renewables.info()
 
-# Validation criteria (R_3)
-idx_not_inst = renewables[(renewables['notification_reason']!= 'Inbetriebnahme')
-                     & (renewables['source'] == 'BNetzA')].index
 
-renewables.loc[idx_not_inst,'comment'] = (renewables.loc[
-                                       idx_not_inst,'comment'] + "R_3, ")
+# In[ ]:
 
-# Validation criteria (R_4)
-idx_pv_date = renewables[(renewables['start_up_date'] < '1975-01-01') 
-                   & (renewables['energy_source'] == 'solar')].index
+# Read csv of Marker Explanations
+validation = pd.read_csv('input/validation_marker.csv',
+                         sep = ',', header = 0)
 
-renewables.loc[idx_pv_date,'comment'] = (renewables.loc[
-                                      idx_pv_date,'comment'] + "R_4, ")
+# Registry of validation criteria: marker and function returning a boolean 
+# mask of the entries the marker applies to. Each marker is stored as one bit 
+# of the column validation_flags, the bits are given by the order of the 
+# registry. The explanation of each marker is given in validation_marker.csv.
+validation_rules = OrderedDict([
+    # Validation criteria (R_1) for source BNetzA and BNetzA_PV
+    ('R_1', lambda df: (df['start_up_date'] <= '2014-12-31')
+                       & df['source'].isin(['BNetzA', 'BNetzA_PV'])),
+    ('R_2', lambda df: df['start_up_date'].isnull()),
+    ('R_3', lambda df: (df['notification_reason'] != 'Inbetriebnahme')
+                       & (df['source'] == 'BNetzA')),
+    ('R_4', lambda df: (df['start_up_date'] < '1975-01-01')
+                       & (df['energy_source'] == 'solar')),
+    ('R_5', lambda df: df['energy_source'] == '#NV'),
+    ('R_6', lambda df: df['electrical_capacity'] <= 0.0)])
+
+
+def evaluate_rules(df, rules):
+    """This function returns the validation flags of the entries of df, 
+    with the bit of each rule set if the rule applies."""
+    flags = np.zeros(len(df), dtype=np.uint32)
+    for bit, (marker, rule) in enumerate(rules.items()):
+        flags |= np.asarray(rule(df), dtype=np.uint32) << np.uint32(bit)
+    return pd.Series(flags, index=df.index, name='validation_flags')
+
+
+def render_comments(flags, rules):
+    """This function returns the validation flags as categorical Series of
+    comments listing the markers, e.g. "R_1, R_3, ". Each distinct 
+    combination of flags is rendered only once."""
+    combinations = np.unique(flags.values)
+    comments = [''.join(marker + ', ' 
+                        for bit, marker in enumerate(rules) 
+                        if combination >> bit & 1)
+                for combination in combinations]
+    codes = np.searchsorted(combinations, flags.values)
+    return pd.Series(pd.Categorical.from_codes(codes, comments), 
+                     index=flags.index, name='comment')
 
-# Validation criteria (R_5)
-idx_nv = renewables[renewables['energy_source'] == '#NV'].index
 
-renewables.loc[idx_nv,'comment'] = (renewables.loc[
-                                 idx_nv,'comment'] + "R_5, ")
+# In[ ]:
 
-# Validation criteria (R_6)
-idx_capacity = renewables[renewables.electrical_capacity <= 0.0].index
+# Mark the entries by all validation criteria
+renewables['validation_flags'] = evaluate_rules(renewables, validation_rules)
 
-renewables.loc[idx_capacity,'comment'] = (renewables.loc[
-                                       idx_capacity,'comment'] + "R_6, ")
+# Overview of the validation criteria and the number of entries marked
+marker_explanation = validation.set_index(validation.columns[0]).iloc[:, 0]
+pd.DataFrame({'explanation': marker_explanation.reindex(list(validation_rules)),
+              'entries': [(renewables['validation_flags'] >> bit & 1).sum()
+                          for bit in range(len(validation_rules))]},
+             index=list(validation_rules))
 
 
 # In[ ]:
 
 # Count entries
-renewables.groupby(['comment','source'])['comment'].count()
+renewables.groupby([render_comments(renewables['validation_flags'],
+                                    validation_rules),
+                    'source'])['source'].count()
 
 
 # In[ ]:
 
 # Locate suspect entires
-idx_suspect = renewables[renewables.comment.str.len() >1].index
+idx_suspect = renewables[renewables['validation_flags'] != 0].index
 
 
 # In[ ]:
 
 # Summarize electrical capacity per energy source of suspect data
-renewables.groupby(['comment','energy_source'])[
-                                        'electrical_capacity'].sum()/1000
+renewables.groupby([render_comments(renewables['validation_flags'],
+                                    validation_rules),
+                    'energy_source'])['electrical_capacity'].sum()/1000
 
 
 # In[ ]:
@@ -139,7 +173,7 @@ renewables_clean = renewables.drop(idx_suspect)
 df_columns = ['start_up_date','electrical_capacity','energy_source',
               'energy_source_subtype','thermal_capacity','postcode','city', 
               'address','tso','lon','lat','eeg_id','power_plant_id',
-              'voltage_level','decommission_date','comment','source']
+              'voltage_level','decommission_date','validation_flags','source']
 
 
 # In[ ]:
@@ -167,28 +201,16 @@ renewables_final.groupby(['energy_source'])['electrical_capacity'].sum()/1000
 # In[ ]:
 
 # Group data frame by remaining comments/markers
-renewables_final.groupby(['comment'])['comment'].count()
+renewables_final.groupby(render_comments(renewables_final['validation_flags'],
+                                         validation_rules)).size()
 
 
 # In[ ]:
 
-# Defining URL
-url_bmwi_stat  ='http://www.erneuerbare-energien.de/EE/Redaktion/DE/'                 'Downloads/zeitreihen-zur-entwicklung-der-erneuerbaren-'                 'energien-in-deutschland-1990-2015-excel.xlsx;jsessionid='                 'FFE958ADA709DCBFDD437C8A8FF7D90B?__blob=publicationFile&v=6'
-
-# Reading BMWi data
-bmwi_stat = pd.ExcelFile(url_bmwi_stat)   
-bmwi_stat = bmwi_stat.parse('4', skiprows=7, skip_footer=8)
-
-# Transform data frame and set column names
-stat = bmwi_stat.T
-stat.columns = ['bmwi_hydro', 'bmwi_wind_onshore','bmwi_wind_offshore',
-                'bmwi_solar','bmwi_biomass','bmwi_biomass_liquid',
-                'bmwi_biomass_gas','bmwi_sewage_gas', 'bmwi_landfill_gas',
-                'bmwi_geothermal','bmwi_total']
-
-# Drop Null column and set index as year
-stat = stat.drop(stat.index[[0]])
-stat.index = pd.to_datetime(stat.index,format="%Y").year
+# Reading BMWi data: the installed capacities per year are downloaded and 
+# converted to a table by download_and_process
+bmwi_stat_path = 'input/bmwi_stat.parquet'
+stat = pq.read_table(bmwi_stat_path).to_pandas()
 
 
 # In[ ]:
@@ -209,153 +231,150 @@ energy_sources = ['biomass','wind_onshore','wind_offshore','solar','gas',
 idx_stat = pd.date_range(start='1990-01-01', end='2016-01-01', freq='A')
 idx_ts = pd.date_range(start='2005-01-01', end='2016-01-31', freq='D')
 
-# Set range of time series as index
-data = pd.DataFrame(index=idx_ts)
-data_stat = pd.DataFrame(index=idx_stat)
-
-# Create cumulated time series per energy source for both time series
-for gtype in energy_sources:
-    
-    temp = renewables_clean[['start_up_date','electrical_capacity'
-                           ]].loc[renewables_clean['temp_energy_source'].isin(
-                                   [gtype])]
-    
-    temp_ts = temp.set_index('start_up_date')
-    
-    # Create cumulated time series per energy_source and year
-    data_stat['capacity_{0}_de'.format(gtype)]  = (
-    temp_ts.resample('A', how='sum').cumsum().fillna(method='ffill')/1000)
-    
-    # Create cumulated time series per energy_source and day
-    data['capacity_{0}_de'.format(gtype)] = temp_ts.resample('D',
-                                   how='sum').cumsum().fillna(method='ffill')/1000
-    # Set index name
-    data.index.name = 'timestamp'
-    
-data_stat.index = pd.to_datetime(data_stat.index,format="%Y").year
-
-
-# In[ ]:
-
-valuation = pd.concat([data_stat, stat], axis=1)
-valuation = valuation.fillna(0)
-
-
-# In[ ]:
-
-# Calculate absolute deviation for each year and energy source
+# Sum of the capacity started up per day and energy source, in one pass
+daily_capacity = (renewables_clean
+                  .groupby([renewables_clean['start_up_date'].dt.floor('D'),
+                            'temp_energy_source'])['electrical_capacity'].sum()
+                  .unstack()
+                  .reindex(columns=energy_sources))
 
-valuation['absolute_wind_onshore'] =(valuation['capacity_wind_onshore_de']
-                                 -valuation['bmwi_wind_onshore']).fillna(0)
+# Cumulated capacity in MW on a dense daily index up to the end of the time 
+# series, days without start-up add no capacity
+cumulated_capacity = (daily_capacity
+                      .reindex(pd.date_range(daily_capacity.index.min(),
+                                             idx_ts[-1], freq='D'))
+                      .fillna(0).cumsum() / 1000)
+cumulated_capacity.columns = ['capacity_{0}_de'.format(gtype) 
+                              for gtype in energy_sources]
 
-valuation['absolute_wind_offshore'] =(valuation['capacity_wind_offshore_de']
-                                 -valuation['bmwi_wind_offshore']).fillna(0)
 
-valuation['absolute_solar'] =(valuation['capacity_solar_de']
-                                  -valuation['bmwi_solar']).fillna(0)
+def capacity_timeseries(freq, index):
+    """This function returns the cumulated capacity per energy source at the
+    end of each period of the frequency freq ('D', 'W', 'M' or 'A') for 
+    the periods in index."""
+    timeseries = cumulated_capacity.resample(freq).last().reindex(index)
+    # No capacity is installed before the first start-up date
+    return timeseries.fillna(0)
 
-valuation['absolute_hydro'] =(valuation['capacity_hydro_de']
-                                  -valuation['bmwi_hydro']).fillna(0)
 
-valuation['absolute_geothermal'] =(valuation['capacity_geothermal_de']
-                                  -valuation['bmwi_geothermal']).fillna(0)
+# Create cumulated time series per energy source and day
+data = capacity_timeseries('D', idx_ts)
+# Set index name
+data.index.name = 'timestamp'
 
-valuation['absolute_biomass'] =(valuation['capacity_biomass_de']
-                                 -(valuation['bmwi_biomass'] 
-                                  +valuation['bmwi_biomass_liquid']
-                                  +valuation['bmwi_biomass_gas'])).fillna(0)
-
-valuation['absolute_gas'] =(valuation['capacity_gas_de']
-                                 -(valuation['bmwi_sewage_gas'] 
-                                  +valuation['bmwi_landfill_gas'])).fillna(0)
-
-valuation['absolute_total'] =((valuation['capacity_biomass_de']
-                              +valuation['capacity_wind_onshore_de']
-                              +valuation['capacity_wind_offshore_de']
-                              +valuation['capacity_solar_de']
-                             +valuation['capacity_gas_de']
-                             +valuation['capacity_geothermal_de']
-                             +valuation['capacity_hydro_de']
-                           ) -(valuation['bmwi_total'] )).fillna(0)
+# Create cumulated time series per energy source and year
+data_stat = capacity_timeseries('A', idx_stat)
+data_stat.index = data_stat.index.year
 
 
 # In[ ]:
 
-#Plot settings for absolute deviation
-deviation_columns = ['absolute_wind_onshore','absolute_wind_offshore',
-                     'absolute_solar','absolute_hydro','absolute_biomass',
-                     'absolute_gas','absolute_total','absolute_geothermal']
-
-dataplot = valuation[deviation_columns]
-
-deviation = Line(dataplot, 
-                 y = deviation_columns,
-                 dash = deviation_columns,
-                 color = deviation_columns,
-            title="Deviation between data set and BMWI statistic", 
-            ylabel='Deviation in MW', 
-            xlabel='From 1990 till 2015',
-            legend=True)
+valuation = pd.concat([data_stat, stat], axis=1)
+valuation = valuation.fillna(0)
 
 
 # In[ ]:
 
-# Show Plot for absolute deviation
-show(deviation)
+# BMWi columns the capacity of each energy source is compared with
+bmwi_mapping = OrderedDict([
+    ('wind_onshore', ['bmwi_wind_onshore']),
+    ('wind_offshore', ['bmwi_wind_offshore']),
+    ('solar', ['bmwi_solar']),
+    ('hydro', ['bmwi_hydro']),
+    ('geothermal', ['bmwi_geothermal']),
+    ('biomass', ['bmwi_biomass', 'bmwi_biomass_liquid', 'bmwi_biomass_gas']),
+    ('gas', ['bmwi_sewage_gas', 'bmwi_landfill_gas'])])
 
 
-# In[ ]:
+def deviations(valuation, mapping, total='bmwi_total'):
+    """This function returns the absolute and relative deviation between 
+    the data set and the BMWi statistic for each energy source of mapping 
+    and for the total, as DataFrames with a column per energy source."""
+    sources = list(mapping)
+    bmwi_columns = [column for columns in mapping.values() 
+                    for column in columns]
 
-# Relative deviation
-valuation['relative_wind_onshore'] =(valuation['absolute_wind_onshore']
-                            /valuation['bmwi_wind_onshore']).fillna(0)
+    # Matrix assigning each BMWi column to its energy source
+    assignment = np.zeros((len(bmwi_columns), len(sources)))
+    assignment[np.arange(len(bmwi_columns)),
+               np.repeat(np.arange(len(sources)),
+                         [len(columns) for columns in mapping.values()])] = 1
 
-valuation['relative_wind_offshore'] =(valuation['absolute_wind_offshore']
-                            /valuation['bmwi_wind_offshore']).fillna(0)
+    dataset = valuation[['capacity_{0}_de'.format(source) 
+                         for source in sources]].values
+    bmwi = valuation[bmwi_columns].values.dot(assignment)
+    dataset = np.column_stack([dataset, dataset.sum(axis=1)])
+    bmwi = np.column_stack([bmwi, valuation[total].values])
 
-valuation['relative_solar'] =(valuation['absolute_solar']
-                            /(valuation['bmwi_solar'] )).fillna(0)
+    absolute = dataset - bmwi
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = absolute / bmwi
 
-valuation['relative_hydro'] =(valuation['absolute_hydro']
-                            /(valuation['bmwi_hydro'] )).fillna(0)
+    columns = sources + ['total']
+    return (pd.DataFrame(absolute, valuation.index, columns).fillna(0),
+            pd.DataFrame(relative, valuation.index, columns).fillna(0))
 
-valuation['relative_geothermal'] =(valuation['absolute_geothermal']
-                            /(valuation['bmwi_geothermal'])).fillna(0)
 
-valuation['relative_biomass'] =(valuation['absolute_biomass']
-                            /(valuation['bmwi_biomass'] )).fillna(0)
+# Calculate absolute and relative deviation for each year and energy source
+absolute, relative = deviations(valuation, bmwi_mapping)
+valuation = pd.concat([valuation, absolute.add_prefix('absolute_'),
+                       relative.add_prefix('relative_')], axis=1)
 
-valuation['relative_gas'] =(valuation['absolute_gas']
-                            /(valuation['bmwi_sewage_gas'] 
-                             +valuation['bmwi_landfill_gas'])).fillna(0)
 
-valuation['relative_total'] =(valuation['absolute_total']
-                            /(valuation['bmwi_total'] )).fillna(0)
+# In[ ]:
+
+# Rendering of the validation report: bokeh is only imported in the process 
+# rendering the plots
+def render_plots(plots, path=report_path):
+    """This function renders a line chart of each DataFrame in the 
+    OrderedDict plots (file name -> DataFrame and y-axis label) as static 
+    HTML file in the folder path."""
+    from bokeh.charts import Line, output_file, save
+
+    os.makedirs(path, exist_ok=True)
+    for name, (dataplot, ylabel) in plots.items():
+        columns = list(dataplot.columns)
+        output_file(os.path.join(path, name + '.html'))
+        save(Line(dataplot, 
+                  y = columns,
+                  dash = columns,
+                  color = columns,
+                  title="Deviation between data set and BMWI statistic", 
+                  ylabel=ylabel, 
+                  xlabel='From 1990 till 2015',
+                  legend=True))
+
+
+def start_report(plots, path=report_path):
+    """This function renders plots in a separate process, which is 
+    returned, or in this process on platforms without fork."""
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        render_plots(plots, path)
+        return None
+    process = multiprocessing.get_context('fork').Process(
+        target=render_plots, args=(plots, path))
+    process.start()
+    return process
 
 
 # In[ ]:
 
-# Plot settings relative deviation
+#Plot settings for absolute and relative deviation
+deviation_columns = ['absolute_wind_onshore','absolute_wind_offshore',
+                     'absolute_solar','absolute_hydro','absolute_biomass',
+                     'absolute_gas','absolute_total','absolute_geothermal']
+
 relative_column = ['relative_wind_onshore','relative_wind_offshore',
                    'relative_solar','relative_hydro','relative_biomass',
                    'relative_gas','relative_total']
 
-dataplot2 = valuation[relative_column]
-
-relative = Line(dataplot2*100, 
-            y = relative_column,
-            dash = relative_column,
-            color = relative_column,
-            title="Deviation between data set and BMWI statistic", 
-            ylabel='Relative difference in percent', 
-            xlabel='From 1990 till 2015',
-            legend=True)
-
-
-# In[ ]:
-
-# Show Plot for relative deviation
-show(relative)
+report_process = None
+if report:
+    report_process = start_report(OrderedDict([
+        ('absolute_deviation', (valuation[deviation_columns],
+                                'Deviation in MW')),
+        ('relative_deviation', (valuation[relative_column]*100,
+                                'Relative difference in percent'))]))
 
 
 # In[ ]:
@@ -371,65 +390,182 @@ path_package = 'output/datapackage_renewables'
 
 os.makedirs(path_package, exist_ok=True)
 
-# Wirte the results as csv
-renewables_final.to_csv(path_package+'/renewable_power_plants_germany.csv',
-                         sep=',' , 
-                         decimal='.', 
-                         date_format='%Y-%m-%d',
-                         encoding='utf-8',
-                         index = False,
-                         if_exists="replace")
-
-
-# In[ ]:
-
-# Read csv of Marker Explanations
-validation = pd.read_csv('input/validation_marker.csv',
-                         sep = ',', header = 0)
+# The validation flags are published as comments listing the markers
+renewables_final.insert(renewables_final.columns.get_loc('validation_flags'),
+                        'comment', 
+                        render_comments(renewables_final['validation_flags'],
+                                        validation_rules))
+renewables_final = renewables_final.drop('validation_flags', axis=1)
 
 
 # In[ ]:
 
-# Write the results as xlsx file
-writer = pd.ExcelWriter(path_package+'/renewable_power_plants_germany.xlsx', 
-                        engine='xlsxwriter')
-
-# Because of the large number of entries we need to splite the data into two sheets
-# (they don't fit on one single Excel sheet)
-renewables_final[:1000000].to_excel(writer, 
-                                     index = False,
-                                    sheet_name='part-1')
-
-renewables_final[1000000:].to_excel(writer, 
-                                    index = False,
-                                    sheet_name='part-2')
-
-# The explanation of validation markers is added as a sheet
-validation.to_excel(writer,
-                    index = False,
-                    sheet_name='validation_marker')
-
-# Close the Pandas Excel writer and output the Excel file.
-writer.save()    
+# Number of rows formatted at once by the export writers
+export_chunksize = 100000
+
+# Maximum number of rows of an Excel sheet, including the header
+xlsx_max_rows = 1048576
+
+
+def export_rows(df):
+    """This function returns the rows of df as lists of Python values, 
+    missing values as None."""
+    return df.astype(object).where(df.notnull(), None).values.tolist()
+
+
+def write_csv(df, path, chunksize=export_chunksize, **kwargs):
+    """This function writes df as csv file chunk by chunk, kwargs are 
+    passed to DataFrame.to_csv. If path ends with .gz, the file is 
+    gzip compressed."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as csv_file:
+        for start in range(0, max(len(df), 1), chunksize):
+            df.iloc[start:start + chunksize].to_csv(csv_file, header=(start == 0),
+                                                    **kwargs)
+    return path
+
+
+def write_parquet(df, path, preserve_index=False):
+    """This function writes df as zstd compressed parquet file. Columns of
+    mixed types are stored as strings, see dataframe_to_arrow."""
+    pq.write_table(dataframe_to_arrow(df, preserve_index=preserve_index),
+                   path, compression='zstd')
+    return path
+
+
+def write_xlsx(path, sheets, chunksize=export_chunksize):
+    """This function writes the DataFrames of the OrderedDict sheets as xlsx 
+    file with a sheet per DataFrame. The rows are written one after the 
+    other in constant memory mode. If a DataFrame does not fit on one sheet,
+    it is continued on further sheets, which are numbered by {0} in the 
+    sheet name."""
+    rows_per_sheet = xlsx_max_rows - 1
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True,
+                                          'default_date_format': 'yyyy-mm-dd',
+                                          'nan_inf_to_errors': True})
+    try:
+        for name, df in sheets.items():
+            parts = max(1, -(-len(df) // rows_per_sheet))
+            for part in range(parts):
+                worksheet = workbook.add_worksheet(name.format(part + 1))
+                worksheet.write_row(0, 0, [str(column) for column in df.columns])
+                row = 1
+                end = min(len(df), (part + 1) * rows_per_sheet)
+                for start in range(part * rows_per_sheet, end, chunksize):
+                    for values in export_rows(df.iloc[start:min(start + chunksize, end)]):
+                        worksheet.write_row(row, 0, values)
+                        row += 1
+    finally:
+        workbook.close()
+    return path
+
+
+def export_pool(max_workers=4):
+    """This function returns an executor for running the export writers in
+    parallel. Threads share the data to export with the notebook, thus it 
+    is not copied for each writer. The compression, Parquet encoding and 
+    SQLite inserts release the GIL."""
+    return concurrent.futures.ThreadPoolExecutor(max_workers)
 
 
 # In[ ]:
 
-# Write the results to sqlite database
-renewables_final.to_sql('renewable_power_plants_germany', 
-                         sqlite3.connect(path_package+
-                                 '/renewable_power_plants_germany.sqlite'),
-                         if_exists="replace") 
+# Bulk writer for SQLite databases: all rows are inserted by executemany in
+# one transaction, journaling and syncing to disk are reduced during the load
+def sqlite_type(dtype):
+    """This function returns the SQLite column type of a pandas dtype."""
+    if dtype.kind in 'iub':
+        return 'INTEGER'
+    if dtype.kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+
+def sqlite_rows(df):
+    """This function returns the rows of df as lists of Python values, 
+    dates as ISO strings and missing values as None."""
+    df = df.copy()
+    for column in df.columns[df.dtypes.apply(lambda dtype: dtype.kind == 'M')]:
+        df[column] = df[column].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df.astype(object).where(df.notnull(), None).values.tolist()
+
+
+def write_sqlite(df, path, table, indexes=(), chunksize=100000):
+    """This function replaces table in the SQLite database at path by df 
+    and creates an index on each of the columns in indexes."""
+    columns = ', '.join('"{0}" {1}'.format(column, sqlite_type(dtype))
+                        for column, dtype in df.dtypes.items())
+    insert = 'INSERT INTO "{0}" VALUES ({1})'.format(
+        table, ', '.join(['?'] * len(df.columns)))
+
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=OFF')
+        with connection:
+            connection.execute('DROP TABLE IF EXISTS "{0}"'.format(table))
+            connection.execute('CREATE TABLE "{0}" ({1})'.format(table, columns))
+            for start in range(0, len(df), chunksize):
+                connection.executemany(
+                    insert, sqlite_rows(df.iloc[start:start + chunksize]))
+            for column in indexes:
+                connection.execute('CREATE INDEX "ix_{0}_{1}" ON "{0}" ("{1}")'
+                                   .format(table, column))
+        # The published database is a single file without write-ahead log
+        connection.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        connection.close()
+    return path
 
 
 # In[ ]:
 
-# Write daily cumulated time series as csv
-data.to_csv(path_package+'/renewable_capacity_germany_timeseries.csv',
-                         sep=',', decimal='.', 
-                         date_format='%Y-%m-%dT%H:%M:%S%z',
-                         encoding='utf-8',
-                         if_exists="replace")
+# Write the results as csv, xlsx and sqlite and the daily cumulated time series
+# as csv, all files at the same time. The writers do not change the data.
+with export_pool() as executor:
+    exports = [
+        executor.submit(write_csv, renewables_final,
+                        path_package + '/renewable_power_plants_germany.csv',
+                        sep=',', 
+                        decimal='.', 
+                        date_format='%Y-%m-%d',
+                        index=False),
+        # Because of the large number of entries the data is split into 
+        # several sheets, the explanation of validation markers is added 
+        # as a sheet
+        executor.submit(write_xlsx,
+                        path_package + '/renewable_power_plants_germany.xlsx',
+                        OrderedDict([('part-{0}', renewables_final),
+                                     ('validation_marker', validation)])),
+        executor.submit(write_sqlite, renewables_final.reset_index(),
+                        path_package + '/renewable_power_plants_germany.sqlite',
+                        'renewable_power_plants_germany',
+                        ['energy_source', 'postcode', 'eeg_id', 'start_up_date']),
+        executor.submit(write_csv, data,
+                        path_package + '/renewable_capacity_germany_timeseries.csv',
+                        sep=',', 
+                        decimal='.', 
+                        date_format='%Y-%m-%dT%H:%M:%S%z'),
+        # Compressed and columnar variants for downloading the data package
+        executor.submit(write_csv, renewables_final,
+                        path_package + '/renewable_power_plants_germany.csv.gz',
+                        sep=',', 
+                        decimal='.', 
+                        date_format='%Y-%m-%d',
+                        index=False),
+        executor.submit(write_parquet, renewables_final,
+                        path_package + '/renewable_power_plants_germany.parquet'),
+        executor.submit(write_csv, data,
+                        path_package + '/renewable_capacity_germany_timeseries.csv.gz',
+                        sep=',', 
+                        decimal='.', 
+                        date_format='%Y-%m-%dT%H:%M:%S%z'),
+        executor.submit(write_parquet, data,
+                        path_package + '/renewable_capacity_germany_timeseries.parquet',
+                        preserve_index=True)]
+
+    for export in concurrent.futures.as_completed(exports):
+        logger.info('Written %s', export.result())
 
 
 # In[ ]:
@@ -630,9 +766,37 @@ opsd-changes-to-last-version: Update of output data (latest version BNetzA-data,
 
 metadata = yaml.load(metadata)
 
+# The gzip compressed csv and parquet variants of the csv files have the 
+# same schema as the csv files
+variants = [('.csv.gz', {'format': 'csv', 'mediatype': 'text/csv',
+                         'compression': 'gzip'}),
+            ('.parquet', {'format': 'parquet',
+                          'mediatype': 'application/vnd.apache.parquet',
+                          'compression': 'zstd'})]
+for resource in list(metadata['resources']):
+    if resource['format'] == 'csv':
+        for extension, properties in variants:
+            variant = OrderedDict(
+                [('path', resource['path'][:-len('.csv')] + extension)])
+            variant.update(properties)
+            variant['schema'] = resource['schema']
+            metadata['resources'].append(variant)
+
 datapackage_json = json.dumps(metadata, indent=4, separators=(',', ': '))
 
 # Write the information of the metadata
 with open(os.path.join(path_package, 'datapackage.json'), 'w') as f:
     f.write(datapackage_json)
 
+
+# In[ ]:
+
+# Wait for the plots of the validation report. A failure of the rendering
+# process is raised like a failure of rendering in this process, after all
+# other files are written
+if report_process is not None:
+    report_process.join()
+    if report_process.exitcode != 0:
+        logger.error('Rendering the validation report in %s failed with exit '
+                     'code %s', report_path, report_process.exitcode)
+        raise RuntimeError('The validation report could not be rendered')